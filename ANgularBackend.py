@@ -0,0 +1,566 @@
+'''
+scene backends of ANgular
+
+Everything ANgular asks maya goes through a backend, so the tool never needs
+pymel. CmdsBackend talks to maya with maya.cmds and the OpenMaya 2.0 API,
+StubBackend keeps an in-memory scene so the pipeline runs outside of maya.
+ANgularBrain.PlayblastFuncs uses the backend given by get_backend.
+'''
+import os
+import json
+import hashlib
+
+_BACKEND_ = None
+_OBJECT_TYPE_FLAGS_ = ('nurbsCurves', 'nurbsSurfaces', 'cv', 'hulls', 'polymeshes', 'subdivSurfaces', 'planes',
+                       'lights', 'cameras', 'imagePlane', 'joints', 'ikHandles', 'deformers', 'dynamics',
+                       'particleInstancers', 'fluids', 'hairSystems', 'follicles', 'nCloths', 'nParticles',
+                       'nRigids', 'dynamicConstraints', 'locators', 'dimensions', 'pivots', 'handles',
+                       'textures', 'strokes', 'motionTrails', 'pluginShapes', 'clipGhosts', 'greasePencils')
+_UNHASHED_NODE_TYPES_ = ('time', 'nodeGraphEditorInfo',)
+_GEOMETRY_INPUTS_ = (('mesh', 'inMesh'), ('nurbsCurve', 'create'), ('nurbsSurface', 'create'), ('lattice', 'latticeInput'),)
+
+
+def get_backend():
+    '''
+    gets the backend in use, a CmdsBackend unless another was set or the
+    ANGULAR_BACKEND environment variable is "stub"
+    '''
+    global _BACKEND_
+    if _BACKEND_ is None:
+        _BACKEND_ = StubBackend() if os.environ.get('ANGULAR_BACKEND') == 'stub' else CmdsBackend()
+    return _BACKEND_
+
+
+def set_backend(backend):
+    '''
+    sets the backend used by the tool, gives back the previous one
+    '''
+    global _BACKEND_
+    previous_backend = _BACKEND_
+    _BACKEND_ = backend
+    return previous_backend
+
+
+class CmdsBackend(object):
+    '''
+    backend of a maya session, interactive or standalone
+    '''
+    def __init__(self):
+        import maya.cmds as cmds
+        import maya.mel as mel
+        self.cmds = cmds
+        self.mel = mel
+
+    def browse_directory(self, caption):
+        try:
+            from PySide2 import QtWidgets
+        except ImportError:
+            from PySide import QtGui as QtWidgets
+        return QtWidgets.QFileDialog.getExistingDirectory(None, caption)
+
+    def list_cameras(self):
+        return self.cmds.listCameras() or []
+
+    def list_camera_infos(self):
+        '''
+        gets the {"name", "namespace", "reference"} of every camera of the scene,
+        walking the camera shapes with the OpenMaya 2.0 API and asking for the
+        file of each reference once rather than for each camera
+        '''
+        import maya.api.OpenMaya as om2
+        reference_files = self.get_reference_files()
+        camera_infos = []
+        camera_iterator = om2.MItDependencyNodes(om2.MFn.kCamera)
+        while not camera_iterator.isDone():
+            camera_infos.append(self.get_camera_info(camera_iterator.thisNode(), reference_files))
+            camera_iterator.next()
+        return camera_infos
+
+    def get_reference_files(self):
+        '''
+        gets the {namespace: short file name} of the loaded references
+        '''
+        reference_files = {}
+        for reference in self.cmds.ls(type='reference') or []:
+            try:
+                namespace = self.cmds.referenceQuery(reference, namespace=1).lstrip(':')
+                reference_files[namespace] = self.cmds.referenceQuery(reference, filename=1, shortName=1)
+            except RuntimeError:
+                continue
+        return reference_files
+
+    def get_camera_info(self, camera_node, reference_files=None):
+        '''
+        gets the {"name", "namespace", "reference"} of the transform of a camera
+        shape MObject
+        '''
+        import maya.api.OpenMaya as om2
+        camera_fn = om2.MFnDagNode(camera_node)
+        transform_fn = om2.MFnDagNode(camera_fn.parent(0))
+        namespace = transform_fn.name().rpartition(':')[0]
+        reference = ''
+        if camera_fn.isFromReferencedFile:
+            if reference_files is None:
+                reference_files = self.get_reference_files()
+            parent_namespace = namespace
+            while parent_namespace and parent_namespace not in reference_files:
+                parent_namespace = parent_namespace.rpartition(':')[0]
+            reference = reference_files.get(parent_namespace, '')
+        return {'name': transform_fn.partialPathName(), 'namespace': namespace, 'reference': reference}
+
+    def add_camera_callbacks(self, on_added, on_removed, on_reset):
+        '''
+        calls on_added with the info of every new camera, on_removed with the
+        name of every deleted camera and on_reset when another scene is opened,
+        gives back the callback ids to give to remove_callbacks
+        '''
+        import maya.api.OpenMaya as om2
+        import maya.utils
+
+        def camera_added(camera_node, client_data):
+            camera_handle = om2.MObjectHandle(camera_node)
+
+            def add_camera():
+                if camera_handle.isValid():
+                    on_added(self.get_camera_info(camera_handle.object()))
+            maya.utils.executeDeferred(add_camera)
+
+        def camera_removed(camera_node, client_data):
+            camera_fn = om2.MFnDagNode(camera_node)
+            if camera_fn.parentCount():
+                on_removed(om2.MFnDagNode(camera_fn.parent(0)).partialPathName())
+
+        return [om2.MDGMessage.addNodeAddedCallback(camera_added, 'camera'),
+                om2.MDGMessage.addNodeRemovedCallback(camera_removed, 'camera'),
+                om2.MSceneMessage.addCallback(om2.MSceneMessage.kAfterOpen, lambda client_data: on_reset()),
+                om2.MSceneMessage.addCallback(om2.MSceneMessage.kAfterNew, lambda client_data: on_reset())]
+
+    def remove_callbacks(self, callback_ids):
+        import maya.api.OpenMaya as om2
+        om2.MMessage.removeCallbacks(callback_ids)
+
+    def run_when_idle(self, func):
+        '''
+        calls func on the main thread once maya is idle
+        '''
+        import maya.utils
+        maya.utils.executeDeferred(func)
+
+    def get_playback_range(self):
+        return self.cmds.playbackOptions(query=1, minTime=1), self.cmds.playbackOptions(query=1, maxTime=1)
+
+    def get_fps(self):
+        return self.mel.eval('currentTimeUnitToFPS()')
+
+    def get_maya_version(self):
+        return self.cmds.about(version=True)
+
+    def get_scene_name(self):
+        '''
+        gets the file name of the open scene without directory and extension,
+        empty for an untitled scene
+        '''
+        return os.path.splitext(os.path.basename(self.cmds.file(q=1, sceneName=1) or ''))[0]
+
+    def get_playblast_formats(self):
+        return self.cmds.playblast(q=1, format=1) or []
+
+    def get_playblast_codecs(self, in_format):
+        return self.mel.eval('playblast -format "{0}" -q -compression;'.format(in_format)) or []
+
+    def get_audio_files(self):
+        return [self.cmds.getAttr('{}.filename'.format(audio)) for audio in self.cmds.ls(type='audio') or []]
+
+    def export_snapshot(self, snapshot_path):
+        return self.cmds.file(snapshot_path, force=True, exportAll=True, type='mayaAscii', preserveReferences=True)
+
+    def create_capture_panels(self, cameras, width, height):
+        cmds = self.cmds
+        window = cmds.window(title='ANgular Capture', widthHeight=(width, height))
+        cmds.columnLayout()
+        panels = {}
+        for cam in cameras:
+            cmds.paneLayout(configuration='single', width=width, height=height)
+            panels[cam] = cmds.modelPanel(camera=cam, menuBarVisible=False)
+            cmds.setParent('..')
+        cmds.showWindow(window)
+        cmds.window(window, e=1, iconify=True)
+        return window, panels
+
+    def delete_capture_panels(self, window, panels):
+        cmds = self.cmds
+        for panel in panels.values():
+            if cmds.modelPanel(panel, q=1, ex=1):
+                cmds.deleteUI(panel, panel=True)
+        if cmds.window(window, q=1, ex=1):
+            cmds.deleteUI(window)
+
+    def playblast(self, **kwargs):
+        return self.cmds.playblast(**kwargs)
+
+    def look_through(self, camera):
+        self.cmds.lookThru(camera)
+
+    def get_current_time(self):
+        return self.cmds.currentTime(q=1)
+
+    def set_current_time(self, frame):
+        self.cmds.currentTime(frame)
+
+    def get_capture_panel(self):
+        '''
+        gets the model panel playblast captures from
+        '''
+        return self.cmds.playblast(activeEditor=True)
+
+    def apply_capture_profile(self, panels, editor_flags, renderer_attributes, evaluation):
+        '''
+        sets the model editor flags of the panels, the Viewport 2.0 attributes
+        and the evaluation options, and gives back the state restore_capture_profile
+        puts back. allObjects is set before the flags of the single object types.
+        Flags and attributes this maya version does not have are skipped.
+        '''
+        cmds = self.cmds
+        state = {'panels': {}, 'renderer': {}, 'evaluation': {}}
+        saved_flags = list(editor_flags)
+        if 'allObjects' in editor_flags:
+            saved_flags = [flag for flag in saved_flags if flag != 'allObjects'] + [flag for flag in _OBJECT_TYPE_FLAGS_ if flag not in editor_flags]
+        for panel in panels:
+            panel_state = {'camera': cmds.modelPanel(panel, q=1, camera=1), 'editor': {}}
+            for flag in saved_flags:
+                try:
+                    panel_state['editor'][flag] = cmds.modelEditor(panel, q=1, **{flag: True})
+                except (TypeError, RuntimeError):
+                    continue
+            state['panels'][panel] = panel_state
+            if 'allObjects' in editor_flags:
+                cmds.modelEditor(panel, e=1, allObjects=editor_flags['allObjects'])
+            for flag, value in editor_flags.items():
+                if flag in panel_state['editor']:
+                    cmds.modelEditor(panel, e=1, **{flag: value})
+
+        for attribute, value in renderer_attributes.items():
+            plug = 'hardwareRenderingGlobals.{}'.format(attribute)
+            if cmds.objExists(plug):
+                state['renderer'][attribute] = cmds.getAttr(plug)
+                cmds.setAttr(plug, value)
+
+        if evaluation.get('mode'):
+            state['evaluation']['mode'] = cmds.evaluationManager(q=1, mode=1)[0]
+            cmds.evaluationManager(mode=evaluation['mode'])
+        if 'cached_playback' in evaluation:
+            try:
+                state['evaluation']['cached_playback'] = cmds.evaluator(name='cache', q=1, enable=1)
+                cmds.evaluator(name='cache', enable=evaluation['cached_playback'])
+            except (TypeError, RuntimeError):
+                pass
+        return state
+
+    def restore_capture_profile(self, state):
+        cmds = self.cmds
+        for panel, panel_state in state['panels'].items():
+            if not cmds.modelPanel(panel, q=1, ex=1):
+                continue
+            for flag, value in panel_state['editor'].items():
+                cmds.modelEditor(panel, e=1, **{flag: value})
+            if panel_state['camera']:
+                cmds.modelPanel(panel, e=1, camera=panel_state['camera'])
+        for attribute, value in state['renderer'].items():
+            cmds.setAttr('hardwareRenderingGlobals.{}'.format(attribute), value)
+        if 'mode' in state['evaluation']:
+            cmds.evaluationManager(mode=state['evaluation']['mode'])
+        if 'cached_playback' in state['evaluation']:
+            cmds.evaluator(name='cache', enable=state['evaluation']['cached_playback'])
+
+    def display_warning(self, message):
+        self.cmds.warning(message)
+
+    def confirm_dialog(self, title, message, icon=None):
+        icon_flags = {'icon': icon} if icon else {}
+        return self.cmds.confirmDialog(title=title, message=message, **icon_flags)
+
+    def get_camera_attributes(self, camera):
+        cmds = self.cmds
+        shapes = cmds.listRelatives(camera, shapes=1, fullPath=1) or [camera]
+        attributes = ('focalLength', 'horizontalFilmAperture', 'verticalFilmAperture', 'filmFit',
+                      'lensSqueezeRatio', 'nearClipPlane', 'farClipPlane', 'orthographic',
+                      'orthographicWidth', 'overscan', 'panZoomEnabled', 'horizontalPan',
+                      'verticalPan', 'zoom')
+        return dict((attribute, cmds.getAttr('{}.{}'.format(shapes[0], attribute))) for attribute in attributes
+                    if cmds.attributeQuery(attribute, node=shapes[0], exists=1))
+
+    def get_camera_nodes(self, camera):
+        '''
+        gets the long names of the transform and shapes of the camera
+        '''
+        cmds = self.cmds
+        return (cmds.ls(camera, long=1) or []) + (cmds.listRelatives(camera, shapes=1, fullPath=1) or [])
+
+    def hash_node(self, static_hash, node):
+        '''
+        hashes the non default values of the attributes of the node not driven
+        by an input connection, as the scene file would save them
+        '''
+        import maya.api.OpenMaya as om2
+        node_fn = om2.MFnDependencyNode(node)
+        plugs = []
+        for index in range(node_fn.attributeCount()):
+            attribute = node_fn.attribute(index)
+            if om2.MFnAttribute(attribute).parent.isNull():
+                plugs.append(node_fn.findPlug(attribute, False))
+        while plugs:
+            plug = plugs.pop()
+            if plug.isDestination:
+                continue
+            if plug.isArray and plug.numConnectedElements():
+                plugs.extend(plug.elementByPhysicalIndex(index) for index in range(plug.numElements()))
+            elif plug.isCompound and plug.numConnectedChildren():
+                plugs.extend(plug.child(index) for index in range(plug.numChildren()))
+            else:
+                for command in plug.getSetAttrCmds(om2.MPlug.kNonDefault, True):
+                    static_hash.update(command.encode('utf-8'))
+
+    def get_scene_state(self, cameras=()):
+        '''
+        hashes the static part of the scene and reads the keys of the time
+        based animation curves with the OpenMaya 2.0 API, in the units maya.cmds
+        gives them in. The static part is the non default value of every
+        attribute without an input connection, the driven keys, the points of
+        the undeformed geometry and the display of the capture panel. The
+        transform, shapes and curves of the given cameras are hashed and read
+        apart, per camera, so editing a camera only makes its own captures stale.
+        '''
+        import maya.api.OpenMaya as om2
+        import maya.api.OpenMayaAnim as oma2
+        cmds = self.cmds
+        camera_nodes = dict((cam, self.get_camera_nodes(cam)) for cam in cameras)
+        all_camera_nodes = set(node for nodes in camera_nodes.values() for node in nodes)
+        camera_hashes = dict((cam, hashlib.sha1()) for cam in cameras)
+        node_cameras = dict((node, cam) for cam, nodes in camera_nodes.items() for node in nodes)
+
+        static_hash = hashlib.sha1()
+        static_hash.update(json.dumps(cmds.ls(long=1, showType=1)).encode('utf-8'))
+        node_iterator = om2.MItDependencyNodes()
+        while not node_iterator.isDone():
+            node = node_iterator.thisNode()
+            node_iterator.next()
+            if node.hasFn(om2.MFn.kAnimCurve) or om2.MFnDependencyNode(node).typeName in _UNHASHED_NODE_TYPES_:
+                continue
+            if node.hasFn(om2.MFn.kDagNode):
+                name = om2.MFnDagNode(node).fullPathName()
+            else:
+                name = om2.MFnDependencyNode(node).name()
+            node_hash = camera_hashes[node_cameras[name]] if name in node_cameras else static_hash
+            node_hash.update(name.encode('utf-8'))
+            self.hash_node(node_hash, node)
+        for curve in cmds.ls(type=('animCurveUA', 'animCurveUL', 'animCurveUT', 'animCurveUU')) or []:
+            static_hash.update(json.dumps([cmds.keyframe(curve, q=1, floatChange=1), cmds.keyframe(curve, q=1, valueChange=1)]).encode('utf-8'))
+        for shape_type, input_attribute in _GEOMETRY_INPUTS_:
+            for shape in cmds.ls(type=shape_type, long=1) or []:
+                if cmds.listConnections('{}.{}'.format(shape, input_attribute), source=1, destination=0):
+                    continue
+                selection = om2.MSelectionList()
+                selection.add(shape)
+                points = om2.MItGeometry(selection.getDagPath(0)).allPositions()
+                static_hash.update(json.dumps([shape, [[round(value, 6) for value in point][:3] for point in points]]).encode('utf-8'))
+        capture_panel = self.get_capture_panel()
+        if capture_panel and cmds.modelEditor(capture_panel, q=1, exists=1):
+            static_hash.update(cmds.modelEditor(capture_panel, q=1, stateString=1).encode('utf-8'))
+
+        curve_cameras = {}
+        for cam, nodes in camera_nodes.items():
+            for curve in set(cmds.listConnections(nodes, source=1, destination=0, type='animCurve') or []):
+                driven_nodes = set(cmds.ls(cmds.listConnections(curve, source=0, destination=1) or [], long=1) or [])
+                if driven_nodes and driven_nodes.issubset(all_camera_nodes):
+                    curve_cameras[curve] = cam
+
+        time_unit = om2.MTime.uiUnit()
+        value_units = {oma2.MFnAnimCurve.kAnimCurveTA: lambda value: om2.MAngle(value).asUnits(om2.MAngle.uiUnit()),
+                       oma2.MFnAnimCurve.kAnimCurveTL: lambda value: om2.MDistance(value).asUnits(om2.MDistance.uiUnit()),
+                       oma2.MFnAnimCurve.kAnimCurveTT: lambda value: om2.MTime(value, om2.MTime.kSeconds).asUnits(time_unit),
+                       oma2.MFnAnimCurve.kAnimCurveTU: lambda value: value}
+        curves = {}
+        camera_curves = dict((cam, {}) for cam in cameras)
+        curve_iterator = om2.MItDependencyNodes(om2.MFn.kAnimCurve)
+        while not curve_iterator.isDone():
+            curve_fn = oma2.MFnAnimCurve(curve_iterator.thisNode())
+            to_ui_unit = value_units.get(curve_fn.animCurveType)
+            if to_ui_unit:
+                keys = []
+                for index in range(curve_fn.numKeys):
+                    keys.append([curve_fn.input(index).asUnits(time_unit),
+                                 to_ui_unit(curve_fn.value(index)),
+                                 curve_fn.getTangentAngleWeight(index, True)[0].asDegrees(),
+                                 curve_fn.getTangentAngleWeight(index, False)[0].asDegrees()])
+                curve = {'infinity': [curve_fn.preInfinityType, curve_fn.postInfinityType],
+                         'keys': [[round(value, 6) for value in key] for key in keys]}
+                if curve_fn.name() in curve_cameras:
+                    camera_curves[curve_cameras[curve_fn.name()]][curve_fn.name()] = curve
+                else:
+                    curves[curve_fn.name()] = curve
+            curve_iterator.next()
+        return {'static': static_hash.hexdigest(), 'curves': curves,
+                'cameras': dict((cam, {'static': camera_hashes[cam].hexdigest(), 'curves': camera_curves[cam]}) for cam in cameras)}
+
+
+class StubBackend(object):
+    '''
+    in-memory scene for running the pipeline outside of maya, the playblasts
+    are recorded in playblasts instead of being taken and the warnings and
+    dialogs in messages
+    '''
+    def __init__(self, cameras=('persp',), start_frame=1, end_frame=24, fps=24.0, scene_name='',
+                 maya_version='2022', formats=('qt', 'avi', 'image'), codecs=None, audio_files=()):
+        self.cameras = list(cameras)
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.fps = fps
+        self.scene_name = scene_name
+        self.maya_version = maya_version
+        self.formats = list(formats)
+        self.codecs = codecs or {'avi': ['none', 'IYUV codec']}
+        self.audio_files = list(audio_files)
+        self.camera_attributes = {}
+        self.camera_references = {}
+        self.camera_callbacks = []
+        self.static_state = {}
+        self.curves = {}
+        self.camera_states = {}
+        self.curve_cameras = {}
+        self.current_time = start_frame
+        self.current_camera = self.cameras[0] if self.cameras else None
+        self.browse_result = ''
+        self.playblasts = []
+        self.messages = []
+        self.capture_profiles = []
+        self.idle_calls = []
+
+    def browse_directory(self, caption):
+        return self.browse_result
+
+    def list_cameras(self):
+        return list(self.cameras)
+
+    def list_camera_infos(self):
+        return [self.get_camera_info(cam) for cam in self.cameras]
+
+    def get_camera_info(self, camera):
+        return {'name': camera, 'namespace': camera.rpartition(':')[0], 'reference': self.camera_references.get(camera, '')}
+
+    def add_camera_callbacks(self, on_added, on_removed, on_reset):
+        self.camera_callbacks.append((on_added, on_removed, on_reset))
+        return [len(self.camera_callbacks) - 1]
+
+    def remove_callbacks(self, callback_ids):
+        for callback_id in callback_ids:
+            self.camera_callbacks[callback_id] = None
+
+    def run_when_idle(self, func):
+        self.idle_calls.append(func)
+
+    def run_idle_calls(self):
+        '''
+        calls the functions waiting for the scene to be idle, and the ones they
+        queue in turn
+        '''
+        while self.idle_calls:
+            self.idle_calls.pop(0)()
+
+    def add_camera(self, camera, reference=''):
+        '''
+        adds a camera to the scene, calling the camera callbacks
+        '''
+        self.cameras.append(camera)
+        if reference:
+            self.camera_references[camera] = reference
+        for callbacks in filter(None, self.camera_callbacks):
+            callbacks[0](self.get_camera_info(camera))
+
+    def remove_camera(self, camera):
+        self.cameras.remove(camera)
+        for callbacks in filter(None, self.camera_callbacks):
+            callbacks[1](camera)
+
+    def get_playback_range(self):
+        return self.start_frame, self.end_frame
+
+    def get_fps(self):
+        return self.fps
+
+    def get_maya_version(self):
+        return self.maya_version
+
+    def get_scene_name(self):
+        return self.scene_name
+
+    def get_playblast_formats(self):
+        return list(self.formats)
+
+    def get_playblast_codecs(self, in_format):
+        return list(self.codecs.get(in_format, []))
+
+    def get_audio_files(self):
+        return list(self.audio_files)
+
+    def export_snapshot(self, snapshot_path):
+        with open(snapshot_path, 'w') as writer:
+            json.dump({'cameras': self.cameras, 'curves': self.curves}, writer)
+        return snapshot_path
+
+    def create_capture_panels(self, cameras, width, height):
+        return 'stubCaptureWindow', dict((cam, 'stubPanel_{}'.format(cam)) for cam in cameras)
+
+    def delete_capture_panels(self, window, panels):
+        pass
+
+    def playblast(self, **kwargs):
+        kwargs.setdefault('camera', self.current_camera)
+        self.playblasts.append(kwargs)
+        output_path = kwargs.get('completeFilename') or kwargs.get('f') or kwargs.get('filename') or ''
+        if kwargs.get('fmt', kwargs.get('format')) == 'image' and not kwargs.get('completeFilename'):
+            return '{}.####.{}'.format(output_path, kwargs.get('c', kwargs.get('compression', 'jpg')))
+        return output_path
+
+    def look_through(self, camera):
+        self.current_camera = camera
+
+    def get_current_time(self):
+        return self.current_time
+
+    def set_current_time(self, frame):
+        self.current_time = frame
+
+    def get_capture_panel(self):
+        return 'modelPanel4'
+
+    def apply_capture_profile(self, panels, editor_flags, renderer_attributes, evaluation):
+        self.capture_profiles.append((list(panels), dict(editor_flags), dict(renderer_attributes), dict(evaluation)))
+        return {'panels': dict((panel, self.current_camera) for panel in panels)}
+
+    def restore_capture_profile(self, state):
+        self.capture_profiles.pop()
+
+    def display_warning(self, message):
+        self.messages.append(('warning', message))
+
+    def confirm_dialog(self, title, message, icon=None):
+        self.messages.append((title, message))
+        return 'Confirm'
+
+    def get_camera_attributes(self, camera):
+        return dict(self.camera_attributes.get(camera, {}))
+
+    def get_scene_state(self, cameras=()):
+        '''
+        camera_states holds the static attributes of every camera and
+        curve_cameras the camera driven by a curve, if any
+        '''
+        static_hash = hashlib.sha1(json.dumps([self.cameras, self.static_state], sort_keys=True).encode('utf-8'))
+        curves = {}
+        camera_curves = dict((cam, {}) for cam in cameras)
+        for curve, keys in json.loads(json.dumps(self.curves)).items():
+            cam = self.curve_cameras.get(curve)
+            (camera_curves[cam] if cam in camera_curves else curves)[curve] = keys
+        camera_hashes = dict((cam, hashlib.sha1(json.dumps(self.camera_states.get(cam, {}), sort_keys=True).encode('utf-8')).hexdigest()) for cam in cameras)
+        return {'static': static_hash.hexdigest(), 'curves': curves,
+                'cameras': dict((cam, {'static': camera_hashes[cam], 'curves': camera_curves[cam]}) for cam in cameras)}
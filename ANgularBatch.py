@@ -0,0 +1,159 @@
+'''
+headless batch runner of ANgular
+
+    python ANgularBatch.py manifest.json --workers 4
+
+The manifest lists the playblast jobs. Every job is a scene file plus the
+ANgularPipeline.PlayblastSettings it overrides over the manifest defaults:
+
+    {
+        "defaults": {"output_dir": "/shows/dailies", "resolution": "1280x720"},
+        "jobs": [
+            {"scene": "/shots/sh010/anim.ma", "cameras": ["camL", "camR"],
+             "start_frame": 1001, "end_frame": 1100},
+            {"scene": "/shots/sh020/anim.ma", "cameras": ["persp"],
+             "start_frame": 1001, "end_frame": 1050, "resolution": "640x480"}
+        ]
+    }
+
+Each job runs in its own mayapy process, at most --workers of them at once.
+The outcome of every job is saved to a state file next to the manifest as
+soon as it ends, so running the same manifest again skips the finished jobs
+and resumes with the failed or interrupted ones.
+'''
+import os
+import sys
+import json
+import argparse
+import traceback
+
+import ANgularWorker as worker
+import ANgularCache as cache
+
+
+def load_manifest(manifest_path):
+    '''
+    gets the jobs of the manifest with the manifest defaults filled in
+    '''
+    with open(manifest_path, 'r') as reader:
+        manifest = json.load(reader)
+    defaults = manifest.get('defaults', {})
+    jobs = []
+    for job in manifest.get('jobs', []):
+        merged_job = dict(defaults)
+        merged_job.update(job)
+        merged_job.setdefault('capture_mode', 'Headless')
+        merged_job.setdefault('scene_name', os.path.splitext(os.path.basename(merged_job['scene']))[0])
+        jobs.append(merged_job)
+    return jobs
+
+
+def get_job_id(job):
+    return cache.make_key(job)
+
+
+def get_state_path(manifest_path):
+    return '{}.state.json'.format(os.path.splitext(manifest_path)[0])
+
+
+def load_state(manifest_path):
+    '''
+    gets the {job_id: {"status": ..., "attempts": ...}} state of the manifest
+    '''
+    state_path = get_state_path(manifest_path)
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path, 'r') as reader:
+        return json.load(reader)
+
+
+def save_state(manifest_path, state):
+    state_path = get_state_path(manifest_path)
+    with open('{}.tmp'.format(state_path), 'w') as writer:
+        json.dump(state, writer, indent=4)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    os.rename('{}.tmp'.format(state_path), state_path)
+
+
+def build_job_command(executable, manifest_path, job_index):
+    '''
+    gets the command line running one job of the manifest in mayapy
+    '''
+    batch_script = '{}.py'.format(os.path.splitext(os.path.abspath(__file__))[0])
+    return [executable, batch_script, os.path.abspath(manifest_path), '--run-job', str(job_index)]
+
+
+def run_manifest(manifest_path, max_workers, executable=None, retries=0):
+    '''
+    runs every unfinished job of the manifest in a pool of mayapy processes,
+    retrying the failed ones up to retries times, and gives back the state
+    '''
+    executable = executable or worker.get_mayapy_path()
+    jobs = load_manifest(manifest_path)
+    state = load_state(manifest_path)
+
+    for attempt in range(retries + 1):
+        pending = [index for index, job in enumerate(jobs) if state.get(get_job_id(job), {}).get('status') != 'done']
+        if not pending:
+            break
+
+        def record(command_index, return_code):
+            job = jobs[pending[command_index]]
+            job_state = state.setdefault(get_job_id(job), {'scene': job['scene'], 'attempts': 0})
+            job_state['attempts'] += 1
+            job_state['status'] = 'done' if return_code == 0 else 'failed'
+            job_state['return_code'] = return_code
+            save_state(manifest_path, state)
+            print('[{}] {} {}'.format(job_state['status'], job['scene'], ', '.join(job.get('cameras', []))))
+
+        worker.run_workers([build_job_command(executable, manifest_path, index) for index in pending], max_workers, on_finished=record)
+    return dict((get_job_id(job), state.get(get_job_id(job), {'scene': job['scene'], 'status': 'pending'})) for job in jobs)
+
+
+def run_job(manifest_path, job_index):
+    '''
+    runs one job of the manifest, meant to be called inside mayapy
+    '''
+    job = load_manifest(manifest_path)[job_index]
+
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+    from maya import cmds
+    cmds.file(job['scene'], open=True, force=True)
+
+    import ANgularPipeline as pipeline
+    try:
+        final_playblast_path = pipeline.Playblaster(pipeline.PlayblastSettings.from_dict(job)).run()
+    except Exception:
+        traceback.print_exc()
+        return 1
+    finally:
+        maya.standalone.uninitialize()
+    print(final_playblast_path)
+    return 0
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Takes ANgular playblasts of many scenes from a manifest')
+    parser.add_argument('manifest', help='json manifest of the playblast jobs')
+    parser.add_argument('--workers', type=int, default=2, help='number of jobs running at once')
+    parser.add_argument('--retries', type=int, default=0, help='number of times the failed jobs are run again')
+    parser.add_argument('--mayapy', help='mayapy executable running the jobs')
+    parser.add_argument('--ffmpeg', help='ffmpeg executable compiling the playblasts')
+    parser.add_argument('--run-job', type=int, help=argparse.SUPPRESS)
+    options = parser.parse_args(args)
+
+    if options.ffmpeg:
+        os.environ['ANGULAR_FFMPEG'] = options.ffmpeg
+    if options.run_job is not None:
+        return run_job(options.manifest, options.run_job)
+
+    state = run_manifest(options.manifest, options.workers, options.mayapy, options.retries)
+    failed = [job_state for job_state in state.values() if job_state.get('status') != 'done']
+    print('{} done, {} failed'.format(len(state) - len(failed), len(failed)))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+'''
+compile benchmark of ANgular
+
+    python ANgularBenchmark.py --ffmpeg /usr/bin/ffmpeg --cameras 1 2 4 --frames 100 1000 --output results.json
+
+Times the ffmpeg stages of the pipeline, compile_playblasts and
+add_audio_to_video, without maya. The scene is an ANgularBackend.StubBackend
+and every camera capture is a synthetic image sequence made with the ffmpeg
+lavfi test sources at the size the pipeline would capture it. Every case records its wall time, frames per second, peak
+memory of the ffmpeg processes of each stage and bytes written to a json file, which can be given back
+with --compare to see the changes against an earlier run.
+'''
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+import ANgularBackend as backend
+import ANgularPipeline as pipeline
+import ANgularTiming as timing
+
+_FPS_ = 24
+_START_FRAME_ = 1001
+
+
+class MeasuredProcess(subprocess.Popen):
+    '''
+    process reaped with os.wait4 where the platform has it, recording the
+    peak resident memory in bytes of the process and its own children
+    '''
+    peak_memory = None
+
+    def wait(self, *args, **kwargs):
+        if self.returncode is None and hasattr(os, 'wait4'):
+            pid, status, usage = os.wait4(self.pid, 0)
+            self.returncode = -os.WTERMSIG(status) if os.WIFSIGNALED(status) else os.WEXITSTATUS(status)
+            self.peak_memory = usage.ru_maxrss if platform.system() == 'Darwin' else usage.ru_maxrss * 1024
+        return super(MeasuredProcess, self).wait(*args, **kwargs)
+
+
+class MeasuredPlayblaster(pipeline.Playblaster):
+    '''
+    playblaster keeping the ffmpeg processes it runs, to measure them
+    '''
+    process_class = MeasuredProcess
+
+    def __init__(self, settings, ffmpeg_path=None):
+        super(MeasuredPlayblaster, self).__init__(settings, ffmpeg_path)
+        self.processes = []
+
+    def open_ffmpeg_process(self, command_to_run, **kwargs):
+        process = super(MeasuredPlayblaster, self).open_ffmpeg_process(command_to_run, **kwargs)
+        self.processes.append(process)
+        return process
+
+    def get_peak_memory(self):
+        '''
+        gets the peak resident memory in bytes of the biggest process run since
+        processes was last emptied, None where the platform does not tell
+        '''
+        peaks = [process.peak_memory for process in self.processes if process.peak_memory is not None]
+        return max(peaks) if peaks else None
+
+
+def make_synthetic_sequence(ffmpeg_path, image_path_template, width, height, frame_count, hue=0):
+    '''
+    writes a test pattern image sequence of frame_count frames from the start
+    frame, each camera getting its own hue
+    '''
+    command = [ffmpeg_path, '-v', 'error', '-f', 'lavfi',
+               '-i', 'testsrc2=size={}x{}:rate={}'.format(width, height, _FPS_),
+               '-vf', 'hue=h={}'.format(hue), '-frames:v', str(frame_count),
+               '-start_number', str(_START_FRAME_), '-q:v', '2', '-y', image_path_template]
+    subprocess.check_call(command)
+
+
+def make_synthetic_audio(ffmpeg_path, audio_path, frame_count):
+    command = [ffmpeg_path, '-v', 'error', '-f', 'lavfi',
+               '-i', 'sine=frequency=440:duration={}'.format(frame_count / float(_FPS_)), '-y', audio_path]
+    subprocess.check_call(command)
+
+
+def run_case(ffmpeg_path, work_dir, camera_count, resolution, frame_count, encoder_profile):
+    '''
+    compiles synthetic captures of camera_count cameras with the pipeline and
+    remuxes audio into the result, and gives back the measures of both stages
+    '''
+    settings = pipeline.PlayblastSettings(output_dir=work_dir, scene_name='benchmark',
+                                          cameras=['cam{}'.format(index) for index in range(camera_count)],
+                                          start_frame=_START_FRAME_, end_frame=_START_FRAME_ + frame_count - 1,
+                                          resolution=resolution, encoder_profile=encoder_profile,
+                                          include_audio=False)
+    playblaster = MeasuredPlayblaster(settings, ffmpeg_path)
+    captures = []
+    for index, (cam, size) in enumerate(zip(settings.cameras, playblaster.get_capture_sizes())):
+        capture_path = '{}/{}_{}.%4d.jpg'.format(work_dir, settings.scene_name, cam)
+        make_synthetic_sequence(ffmpeg_path, capture_path, size[0], size[1], frame_count, index * 360 // camera_count)
+        captures.append(capture_path)
+    audio_path = '{}/benchmark.wav'.format(work_dir)
+    make_synthetic_audio(ffmpeg_path, audio_path, frame_count)
+
+    case = {'cameras': camera_count, 'resolution': resolution, 'frames': frame_count,
+            'encoder_profile': encoder_profile, 'stages': {}}
+    compiled_path = settings.final_playblast_path
+    stages = (('compile_playblasts', lambda: playblaster.compile_playblasts(compiled_path, captures), compiled_path),
+              ('add_audio_to_video', lambda: playblaster.add_audio_to_video(audio_path, compiled_path, '{}/benchmark_audio.mov'.format(work_dir)), '{}/benchmark_audio.mov'.format(work_dir)))
+    for stage_name, stage, output_path in stages:
+        playblaster.processes = []
+        start_time = time.time()
+        stage()
+        wall_time = time.time() - start_time
+        case['stages'][stage_name] = {'wall_time': round(wall_time, 3),
+                                      'fps': round(frame_count / wall_time, 1) if wall_time else None,
+                                      'speed': playblaster.ffmpeg_speed,
+                                      'peak_memory': playblaster.get_peak_memory(),
+                                      'bytes_written': timing.get_size(output_path)}
+    return case
+
+
+def run_benchmark(ffmpeg_path, camera_counts, resolutions, frame_counts, encoder_profiles, keep=False):
+    '''
+    runs every combination of the given cases and gives back the results
+    '''
+    backend.set_backend(backend.StubBackend(fps=_FPS_))
+
+    results = {'platform': platform.platform(), 'python': platform.python_version(),
+               'ffmpeg': subprocess.check_output([ffmpeg_path, '-version']).decode('utf-8', 'replace').splitlines()[0],
+               'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'cases': []}
+    for resolution in resolutions:
+        for frame_count in frame_counts:
+            for camera_count in camera_counts:
+                for encoder_profile in encoder_profiles:
+                    work_dir = tempfile.mkdtemp(prefix='angular_benchmark_')
+                    try:
+                        case = run_case(ffmpeg_path, work_dir, camera_count, resolution, frame_count, encoder_profile)
+                    finally:
+                        if not keep:
+                            shutil.rmtree(work_dir, ignore_errors=True)
+                    print('{cameras} cameras {resolution} {frames} frames {encoder_profile}'.format(**case))
+                    for stage_name, measures in sorted(case['stages'].items()):
+                        print('    {:<20} {:>8.3f}s {:>8} fps'.format(stage_name, measures['wall_time'], measures['fps']))
+                    results['cases'].append(case)
+    return results
+
+
+def get_case_key(case):
+    return (case['cameras'], case['resolution'], case['frames'], case['encoder_profile'])
+
+
+def compare_results(old_results, new_results):
+    '''
+    gets (case key, stage, old wall time, new wall time, ratio) of every stage
+    measured in both results, a ratio over 1 being a slowdown
+    '''
+    old_cases = dict((get_case_key(case), case) for case in old_results['cases'])
+    comparison = []
+    for case in new_results['cases']:
+        old_case = old_cases.get(get_case_key(case))
+        if not old_case:
+            continue
+        for stage_name, measures in sorted(case['stages'].items()):
+            old_measures = old_case['stages'].get(stage_name)
+            if old_measures and old_measures['wall_time']:
+                comparison.append((get_case_key(case), stage_name, old_measures['wall_time'], measures['wall_time'],
+                                   measures['wall_time'] / old_measures['wall_time']))
+    return comparison
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Times the ffmpeg stages of ANgular on synthetic captures')
+    parser.add_argument('--ffmpeg', default=os.environ.get('ANGULAR_FFMPEG') or 'ffmpeg', help='ffmpeg executable to benchmark')
+    parser.add_argument('--cameras', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--resolutions', nargs='+', default=['1280x720', '1920x1080'])
+    parser.add_argument('--frames', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--profiles', nargs='+', default=['Draft', 'Review', 'Final'], help='encoder profiles')
+    parser.add_argument('--output', default='angular_benchmark.json', help='json file the results are written to')
+    parser.add_argument('--compare', help='json results of an earlier run to compare with')
+    parser.add_argument('--keep', action='store_true', help='keeps the synthetic captures and playblasts')
+    options = parser.parse_args(args)
+
+    ffmpeg_path = getattr(shutil, 'which', lambda name: None)(options.ffmpeg) or options.ffmpeg
+    results = run_benchmark(ffmpeg_path, options.cameras, options.resolutions, options.frames, options.profiles, options.keep)
+    with open(options.output, 'w') as writer:
+        json.dump(results, writer, indent=4)
+    print('results written to {}'.format(options.output))
+
+    if options.compare:
+        with open(options.compare, 'r') as reader:
+            old_results = json.load(reader)
+        for case_key, stage_name, old_time, new_time, ratio in compare_results(old_results, results):
+            print('{} cameras {} {} frames {:<7} {:<20} {:>8.3f}s -> {:>8.3f}s x{:.2f}'.format(case_key[0], case_key[1], case_key[2], case_key[3], stage_name, old_time, new_time, ratio))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,14 @@
 import os
 import json
-import glob
-import shutil
 import inspect
-import subprocess
 import platform
+import multiprocessing
 
 import maya.OpenMayaUI as openUI
-import pymel.core as pm
+import maya.cmds as cmds
 import imp
 
-if "2016" in pm.about(v=1):
+if "2016" in cmds.about(v=1):
     from PySide import QtGui, QtCore
     from PySide import QtGui as QtWidgets
     from PySide.QtGui import *
@@ -25,16 +23,27 @@ else:
     from PySide2.QtCore import Qt
     from shiboken2 import wrapInstance
     maya_2016 = False
+import ANgularBackend as backend
 import ANgularBrain as brain
+import ANgularCameras as cameras
+import ANgularWorker as worker
+import ANgularProcess as process
+import ANgularCache as cache
+import ANgularLayout as layout
+import ANgularTiming as timing
+import ANgularCompositor as compositor
+import ANgularPipeline as pipeline
+import ANgularQueue as queue
 import cwd as getCurrentDirectory
 
 
-for __module in (brain, getCurrentDirectory):
-    imp.reload(__module)
+if os.environ.get("debug") == "true":
+    for __module in (backend, brain, cameras, worker, process, cache, layout, timing, compositor, pipeline, queue, getCurrentDirectory):
+        imp.reload(__module)
 
 __TOOL_NAME__ = "ANgular"
 cwd = getCurrentDirectory.getcwd()
-_FFMPEG_EXE_PATH_ = '{}/ffmpeg_exe/ffmpeg.exe'.format(cwd)
+_FFMPEG_EXE_PATH_ = pipeline.get_ffmpeg_path()
 _PLATFORM_ = platform.system()
 
 def printdebug(*args):
@@ -54,28 +63,34 @@ def delete_widget_instances(maya_window, tool_name):
 
     for i in maya_window.children():
         if i and i.objectName()==tool_name:
+            if hasattr(i, 'camera_model'):
+                i.camera_model.unwatch_scene()
+            if hasattr(i, 'playblast_queue'):
+                i.playblast_queue.cancel()
             i.setParent(None)
             i.deleteLater()
             return
 
 class PlayblastUI(QtWidgets.QDialog):
-    def __init__(self, parent = main_maya_win()):
-        QtWidgets.QDialog.__init__(self,parent)
+    def __init__(self, parent = None):
+        QtWidgets.QDialog.__init__(self,parent or main_maya_win())
         self.setWindowTitle(__TOOL_NAME__)
         self.setObjectName(__TOOL_NAME__)
         self.resize(400,400)
+        self.job_items = {}
+        self.playblast_queue = queue.PlayblastQueue(parent=self)
         self.setup_ui()
-        self.normal_layout_maps = ("0_0", "w0_0", "0_h0", "w0_h0")
-        self.three_layout_maps = ("0_0", "w0_0", "w0_h1", "w0_h0")
-        self.base_command = '"{}"'.format(_FFMPEG_EXE_PATH_)
+        self.playblast_queue.job_changed.connect(self.show_job)
+        self.playblast_queue.job_finished.connect(self.finish_job)
         self.__force_close__ = False
         if not os.path.exists(_FFMPEG_EXE_PATH_):
-            pm.confirmDialog(icon='critical', title='FFMPEG missing', message='FFMPEG is missing from your ANgular directory, make sure ANgular directory has ffmpeg.exe in it')
+            brain.PlayblastFuncs.confirm_dialog('FFMPEG missing', 'FFMPEG is missing from your ANgular directory, make sure ANgular directory has ffmpeg.exe in it', 'critical')
             self.__force_close__ = True
             self.close()
             raise ValueError ('FFMPEG is missing from your ANgular directory, make sure ANgular directory has ffmpeg.exe in it')
         image_path = os.path.join(cwd, '{}.png'.format(__TOOL_NAME__))
         self.setWindowIcon(QtGui.QIcon(image_path))
+        QtCore.QTimer.singleShot(0, self.populate_cameras)
 
     def setup_ui(self):
         main_layout = QtWidgets.QVBoxLayout()
@@ -92,8 +107,18 @@ class PlayblastUI(QtWidgets.QDialog):
         reset_settings_action.setShortcut("Ctrl+R")
         reset_settings_action.triggered.connect(self.reset_settings)
 
+        clear_cache_action = QtWidgets.QAction("Clear Capture Cache", self)
+        clear_cache_action.triggered.connect(self.clear_capture_cache)
+        refresh_capabilities_action = QtWidgets.QAction("Refresh Formats And Codecs", self)
+        refresh_capabilities_action.triggered.connect(self.refresh_capabilities)
+        self.show_run_summary_action = QtWidgets.QAction("Show Run Summary", self)
+        self.show_run_summary_action.setCheckable(True)
+
         edit_menu.addAction(save_settings_action)
         edit_menu.addAction(reset_settings_action)
+        edit_menu.addAction(clear_cache_action)
+        edit_menu.addAction(refresh_capabilities_action)
+        edit_menu.addAction(self.show_run_summary_action)
 
         about_action = QtWidgets.QAction("About", self)
         about_action.triggered.connect(self.about_the_tool)
@@ -122,13 +147,39 @@ class PlayblastUI(QtWidgets.QDialog):
         self.output_file_layout.addWidget(self.output_file_name_line_edit)
         self.options_layout.addLayout(self.output_file_layout)
 
+        self.scratch_horizontal_layout = QtWidgets.QHBoxLayout()
+        self.scratch_label = QtWidgets.QLabel("Scratch Path: ")
+        self.scratch_horizontal_layout.addWidget(self.scratch_label)
+        self.scratch_line_edit = QtWidgets.QLineEdit()
+        self.scratch_line_edit.setPlaceholderText(pipeline.get_scratch_root())
+        self.scratch_line_edit.setToolTip("Local folder the camera captures are written to before compiling, only the final playblast goes to the File Path")
+        self.scratch_horizontal_layout.addWidget(self.scratch_line_edit)
+        self.scratch_browse_btn = QtWidgets.QPushButton(clicked = self.set_scratch_path)
+        self.scratch_browse_btn.setIcon(QtGui.QIcon(":fileOpen.png"))
+        self.scratch_horizontal_layout.addWidget(self.scratch_browse_btn)
+        self.options_layout.addLayout(self.scratch_horizontal_layout)
+
         self.camera_align_layout = QtWidgets.QVBoxLayout()
         self.camera_views_label = QtWidgets.QLabel("Cameras: ")
         self.camera_align_layout.addWidget(self.camera_views_label)
-        self.camera_list_widget = QtWidgets.QListWidget()
-        self.camera_list_widget.addItems(brain.PlayblastFuncs.get_cameras())
-        self.camera_list_widget.setSelectionMode(QAbstractItemView.ExtendedSelection)
-        self.camera_align_layout.addWidget(self.camera_list_widget)
+        self.camera_filter_layout = QtWidgets.QHBoxLayout()
+        self.camera_filter_line_edit = QtWidgets.QLineEdit()
+        self.camera_filter_line_edit.setPlaceholderText("Filter cameras")
+        self.camera_filter_layout.addWidget(self.camera_filter_line_edit)
+        self.camera_filter_combo_box = QtWidgets.QComboBox()
+        self.camera_filter_combo_box.addItems(cameras.CameraFilterModel.filter_fields)
+        self.camera_filter_layout.addWidget(self.camera_filter_combo_box)
+        self.camera_align_layout.addLayout(self.camera_filter_layout)
+        self.camera_model = cameras.CameraModel(self)
+        self.camera_filter_model = cameras.CameraFilterModel(self)
+        self.camera_filter_model.setSourceModel(self.camera_model)
+        self.camera_list_view = QtWidgets.QListView()
+        self.camera_list_view.setModel(self.camera_filter_model)
+        self.camera_list_view.setUniformItemSizes(True)
+        self.camera_list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.camera_align_layout.addWidget(self.camera_list_view)
+        self.camera_filter_line_edit.textChanged.connect(lambda text: self.camera_filter_model.set_filter(filter_text=text))
+        self.camera_filter_combo_box.currentIndexChanged.connect(lambda *args: self.camera_filter_model.set_filter(filter_field=self.camera_filter_combo_box.currentText()))
         self.options_layout.addLayout(self.camera_align_layout)
 
         self.frame_range_horizontal_layout = QtWidgets.QHBoxLayout()
@@ -147,16 +198,73 @@ class PlayblastUI(QtWidgets.QDialog):
         self.frame_range_horizontal_layout.addWidget(self.end_range)
         self.options_layout.addLayout(self.frame_range_horizontal_layout)
 
+        self.capture_mode_layout = QtWidgets.QHBoxLayout()
+        self.capture_mode_label = QtWidgets.QLabel("Capture Mode: ")
+        self.capture_mode_layout.addWidget(self.capture_mode_label)
+        self.capture_mode_combo_box = QtWidgets.QComboBox()
+        self.capture_mode_combo_box.addItems(brain.PlayblastFuncs.get_capture_modes())
+        self.capture_mode_layout.addWidget(self.capture_mode_combo_box)
+        self.workers_label = QtWidgets.QLabel("Workers: ")
+        self.capture_mode_layout.addWidget(self.workers_label)
+        self.workers_spin_box = QtWidgets.QSpinBox()
+        self.workers_spin_box.setRange(1, 64)
+        self.workers_spin_box.setValue(min(4, multiprocessing.cpu_count()))
+        self.capture_mode_layout.addWidget(self.workers_spin_box)
+        self.options_layout.addLayout(self.capture_mode_layout)
+
+        self.cache_layout = QtWidgets.QHBoxLayout()
+        self.use_cache_checkbox = QtWidgets.QCheckBox('Use Capture Cache')
+        self.cache_layout.addWidget(self.use_cache_checkbox)
+        self.cache_size_label = QtWidgets.QLabel("Cache Size (GB): ")
+        self.cache_layout.addWidget(self.cache_size_label)
+        self.cache_size_spin_box = QtWidgets.QSpinBox()
+        self.cache_size_spin_box.setRange(1, 1000)
+        self.cache_size_spin_box.setValue(20)
+        self.cache_layout.addWidget(self.cache_size_spin_box)
+        self.profile_frames_checkbox = QtWidgets.QCheckBox('Profile Frames')
+        self.profile_frames_checkbox.setToolTip("Times the scene evaluation and viewport readback of every frame and camera, a frame at a time")
+        self.cache_layout.addWidget(self.profile_frames_checkbox)
+        self.options_layout.addLayout(self.cache_layout)
+
         self.playblast_horizontal_layout = QtWidgets.QHBoxLayout()
         self.add_audio_checkbox = QtWidgets.QCheckBox('Include Audio')
         self.add_audio_checkbox.setChecked(1)
         self.playblast_horizontal_layout.addWidget(self.add_audio_checkbox)
+        self.draft_checkbox = QtWidgets.QCheckBox('Draft First')
+        self.draft_checkbox.setToolTip("Opens a half resolution draft of every Nth frame right away, then takes the full quality playblast")
+        self.playblast_horizontal_layout.addWidget(self.draft_checkbox)
+        self.draft_step_spin_box = QtWidgets.QSpinBox()
+        self.draft_step_spin_box.setRange(1, 24)
+        self.draft_step_spin_box.setValue(4)
+        self.draft_step_spin_box.setPrefix("Every ")
+        self.playblast_horizontal_layout.addWidget(self.draft_step_spin_box)
         self.playblast_btn = QtWidgets.QPushButton(" Playblast ", clicked= self.take_playblast)
         self.playblast_btn.setFixedSize(QtCore.QSize(300, 25))
         self.playblast_horizontal_layout.addWidget(self.playblast_btn)
 
         self.options_layout.addLayout(self.playblast_horizontal_layout)
 
+        self.jobs_label = QtWidgets.QLabel("Playblasts: ")
+        self.options_layout.addWidget(self.jobs_label)
+        self.jobs_list_widget = QtWidgets.QListWidget()
+        self.jobs_list_widget.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.jobs_list_widget.setMaximumHeight(100)
+        self.jobs_list_widget.itemSelectionChanged.connect(self.show_progress)
+        self.options_layout.addWidget(self.jobs_list_widget)
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.options_layout.addWidget(self.progress_bar)
+        self.progress_label = QtWidgets.QLabel("")
+        self.options_layout.addWidget(self.progress_label)
+        self.show_progress()
+        self.jobs_horizontal_layout = QtWidgets.QHBoxLayout()
+        self.cancel_btn = QtWidgets.QPushButton(" Cancel ", clicked= self.cancel_compile)
+        self.cancel_btn.setToolTip("Cancels the selected playblasts, or all of them when none is selected")
+        self.jobs_horizontal_layout.addWidget(self.cancel_btn)
+        self.clear_jobs_btn = QtWidgets.QPushButton(" Clear Finished ", clicked= self.clear_finished_jobs)
+        self.jobs_horizontal_layout.addWidget(self.clear_jobs_btn)
+        self.options_layout.addLayout(self.jobs_horizontal_layout)
+
         tab1_widget.setLayout(self.options_layout)
 
 
@@ -172,6 +280,22 @@ class PlayblastUI(QtWidgets.QDialog):
         self.resolution_layout.addWidget(self.resolution_combo_box)
         self.display_layout.addLayout(self.resolution_layout)
 
+        self.layout_horizontal_layout = QtWidgets.QHBoxLayout()
+        self.layout_label = QtWidgets.QLabel("Layout: ")
+        self.layout_horizontal_layout.addWidget(self.layout_label)
+        self.layout_combo_box = QtWidgets.QComboBox()
+        self.layout_combo_box.addItems(brain.PlayblastFuncs.get_layouts())
+        self.layout_horizontal_layout.addWidget(self.layout_combo_box)
+        self.display_layout.addLayout(self.layout_horizontal_layout)
+
+        self.tile_size_layout = QtWidgets.QHBoxLayout()
+        self.tile_size_label = QtWidgets.QLabel("Capture At Tile Size: ")
+        self.tile_size_layout.addWidget(self.tile_size_label)
+        self.tile_size_checkbox = QtWidgets.QCheckBox()
+        self.tile_size_checkbox.setChecked(1)
+        self.tile_size_layout.addWidget(self.tile_size_checkbox)
+        self.display_layout.addLayout(self.tile_size_layout)
+
         self.view_polys_layout = QtWidgets.QHBoxLayout()
         self.view_poly = QtWidgets.QLabel("View Only Polygons: ")
         self.view_polys_layout.addWidget(self.view_poly)
@@ -179,6 +303,15 @@ class PlayblastUI(QtWidgets.QDialog):
         self.view_polys_layout.addWidget(self.view_polys_checkbox)
         self.display_layout.addLayout(self.view_polys_layout)
 
+        self.capture_profile_horizontal_layout = QtWidgets.QHBoxLayout()
+        self.capture_profile_label = QtWidgets.QLabel("Capture Profile : ")
+        self.capture_profile_horizontal_layout.addWidget(self.capture_profile_label)
+        self.capture_profile_combo_box = QtWidgets.QComboBox()
+        self.capture_profile_combo_box.addItems(brain.PlayblastFuncs.get_capture_profiles())
+        self.capture_profile_combo_box.setToolTip("Viewport features turned off while capturing, the viewport is restored afterwards")
+        self.capture_profile_horizontal_layout.addWidget(self.capture_profile_combo_box)
+        self.display_layout.addLayout(self.capture_profile_horizontal_layout)
+
         self.quality_horizontal_layout = QtWidgets.QHBoxLayout()
         self.quality_label = QtWidgets.QLabel("Quality: ")
         self.quality_horizontal_layout.addWidget(self.quality_label)
@@ -194,11 +327,42 @@ class PlayblastUI(QtWidgets.QDialog):
         self.quality_horizontal_layout.addWidget(self.quality_value_slider)
         self.display_layout.addLayout(self.quality_horizontal_layout)
 
+        self.encoder_horizontal_layout = QtWidgets.QHBoxLayout()
+        self.encoder_label = QtWidgets.QLabel("Encoder : ")
+        self.encoder_horizontal_layout.addWidget(self.encoder_label)
+        self.encoder_combo_box = QtWidgets.QComboBox()
+        self.encoder_combo_box.addItems(brain.PlayblastFuncs.get_encoder_profiles())
+        self.encoder_horizontal_layout.addWidget(self.encoder_combo_box)
+        self.encoder_threads_label = QtWidgets.QLabel("Threads : ")
+        self.encoder_horizontal_layout.addWidget(self.encoder_threads_label)
+        self.encoder_threads_spin_box = QtWidgets.QSpinBox()
+        self.encoder_threads_spin_box.setRange(0, 128)
+        self.encoder_threads_spin_box.setSpecialValueText("Auto")
+        self.encoder_horizontal_layout.addWidget(self.encoder_threads_spin_box)
+        self.parallel_encodes_label = QtWidgets.QLabel("Parallel : ")
+        self.encoder_horizontal_layout.addWidget(self.parallel_encodes_label)
+        self.parallel_encodes_spin_box = QtWidgets.QSpinBox()
+        self.parallel_encodes_spin_box.setRange(1, 32)
+        self.parallel_encodes_spin_box.setToolTip("Number of frame range chunks encoded at once, joined without encoding them again")
+        self.encoder_horizontal_layout.addWidget(self.parallel_encodes_spin_box)
+        self.display_layout.addLayout(self.encoder_horizontal_layout)
+
+        self.deliverables_horizontal_layout = QtWidgets.QHBoxLayout()
+        self.deliverables_label = QtWidgets.QLabel("Deliverables : ")
+        self.deliverables_horizontal_layout.addWidget(self.deliverables_label)
+        self.deliverable_checkboxes = []
+        for deliverable in brain.PlayblastFuncs.get_deliverables():
+            deliverable_checkbox = QtWidgets.QCheckBox(deliverable)
+            self.deliverables_horizontal_layout.addWidget(deliverable_checkbox)
+            self.deliverable_checkboxes.append(deliverable_checkbox)
+        self.deliverables_label.setToolTip("Extra outputs compiled next to the final playblast from the same ffmpeg pass")
+        self.display_layout.addLayout(self.deliverables_horizontal_layout)
+
         self.format_horizontal_layout = QtWidgets.QHBoxLayout()
         self.format_label = QtWidgets.QLabel("Format : ")
         self.format_horizontal_layout.addWidget(self.format_label)
         self.format_combo_box = QtWidgets.QComboBox()
-        self.format_combo_box.addItems(brain.PlayblastFuncs.get_playblast_formats())
+        self.format_combo_box.addItems(pipeline.get_playblast_formats())
         self.format_combo_box.currentIndexChanged.connect(self.set_codecs)
         self.format_horizontal_layout.addWidget(self.format_combo_box)
         self.display_layout.addLayout(self.format_horizontal_layout)
@@ -210,6 +374,14 @@ class PlayblastUI(QtWidgets.QDialog):
         self.codec_horizontal_layout.addWidget(self.codec_combo_box)
         self.display_layout.addLayout(self.codec_horizontal_layout)
 
+        self.intermediate_horizontal_layout = QtWidgets.QHBoxLayout()
+        self.intermediate_label = QtWidgets.QLabel("Intermediate : ")
+        self.intermediate_horizontal_layout.addWidget(self.intermediate_label)
+        self.intermediate_combo_box = QtWidgets.QComboBox()
+        self.intermediate_combo_box.addItems(brain.PlayblastFuncs.get_intermediates())
+        self.intermediate_horizontal_layout.addWidget(self.intermediate_combo_box)
+        self.display_layout.addLayout(self.intermediate_horizontal_layout)
+
         tab2_widget.setLayout(self.display_layout)
 
         tab_widget.addTab(tab1_widget,"Options")
@@ -227,6 +399,35 @@ class PlayblastUI(QtWidgets.QDialog):
         self.set_codecs()
         self.load_settings()
 
+    def populate_cameras(self, *args):
+        '''
+        fills the camera list once the dialog is shown, so opening it does not
+        wait on the scene, and keeps it in sync with the scene cameras
+        '''
+        self.camera_model.refresh()
+        self.camera_model.watch_scene()
+
+    def get_selected_cameras(self):
+        '''
+        gets the names of the selected cameras, in the order of the list
+        '''
+        indexes = sorted(self.camera_list_view.selectionModel().selectedIndexes(), key=lambda index: index.row())
+        return [index.data() for index in indexes]
+
+    def refresh_capabilities(self, *args):
+        '''
+        probes the playblast formats and codecs of maya again
+        '''
+        current_format = self.format_combo_box.currentText()
+        pipeline.clear_capabilities()
+        self.format_combo_box.blockSignals(True)
+        self.format_combo_box.clear()
+        self.format_combo_box.addItems(pipeline.get_playblast_formats())
+        format_index = self.format_combo_box.findText(current_format)
+        self.format_combo_box.setCurrentIndex(max(0, format_index))
+        self.format_combo_box.blockSignals(False)
+        self.set_codecs()
+
     def closeEvent(self, event):
         if self.__force_close__:
             return event.accept()
@@ -235,6 +436,8 @@ class PlayblastUI(QtWidgets.QDialog):
             "Are you sure to quit?", QtWidgets.QMessageBox.Yes, QtWidgets.QMessageBox.No)
 
         if reply == QtWidgets.QMessageBox.Yes:
+            self.playblast_queue.cancel()
+            self.camera_model.unwatch_scene()
             event.accept()
         else:
             event.ignore()
@@ -244,7 +447,7 @@ class PlayblastUI(QtWidgets.QDialog):
         sets the codecs from selected formats
         '''
         self.codec_combo_box.clear()
-        self.codec_combo_box.addItems(brain.PlayblastFuncs.get_codecs(self.format_combo_box.currentText()))
+        self.codec_combo_box.addItems(pipeline.get_codecs(self.format_combo_box.currentText()))
 
     def set_quality_slider_to_lineedit(self, *args):
         '''
@@ -265,7 +468,7 @@ class PlayblastUI(QtWidgets.QDialog):
         if value <= self.quality_value_slider.maximum() and value >= self.quality_value_slider.minimum() :
             self.quality_value_slider.setValue(value)
         else:
-            pm.displayWarning('Value exceeds the range {} - {}'.format(self.quality_value_slider.minimum(), self.quality_value_slider.maximum()))
+            brain.PlayblastFuncs.display_warning('Value exceeds the range {} - {}'.format(self.quality_value_slider.minimum(), self.quality_value_slider.maximum()))
             self.quality_value_slider.setValue(0)
 
     def set_file_path(self):
@@ -276,14 +479,24 @@ class PlayblastUI(QtWidgets.QDialog):
         old_text = self.file_input_line_edit.text()
         self.file_input_line_edit.setText(browse_path if browse_path else old_text)
 
+    def set_scratch_path(self):
+        '''
+        sets the scratch path
+        '''
+        browse_path = brain.PlayblastFuncs.file_browsing()
+        if browse_path:
+            self.scratch_line_edit.setText(browse_path)
+
     def get_settings_dir(self):
         """
         """
-        home_dir = os.path.expanduser("~")
-        playblast_dir = "{}/playblast".format(home_dir)
-        if not os.path.exists(playblast_dir):
-            os.makedirs(playblast_dir)
-        return playblast_dir
+        return pipeline.get_settings_dir()
+
+    def clear_capture_cache(self, *args):
+        '''
+        removes every cached capture
+        '''
+        pipeline.get_capture_cache(self.cache_size_spin_box.value()).clear()
 
     def load_settings(self, *args):
         """
@@ -310,6 +523,8 @@ class PlayblastUI(QtWidgets.QDialog):
             self.format_combo_box.setCurrentText(data_to_load.get("format", ""))
             self.codec_combo_box.setCurrentText(data_to_load.get("codec", ""))
         self.file_input_line_edit.setText(data_to_load.get("file_path", ""))
+        self.scratch_line_edit.setText(data_to_load.get("scratch_path", ""))
+        self.show_run_summary_action.setChecked(data_to_load.get("show_run_summary", False))
 
     def save_settings(self, reset=False, *args):
         """
@@ -321,10 +536,13 @@ class PlayblastUI(QtWidgets.QDialog):
         file_path_line_edit = self.file_input_line_edit.text()
         if reset == False:
             data_to_write_dict = {"quality": quality_line_edit_value, "format": format_combobox_value, 
-            "codec": codec_combobox_value, "file_path": file_path_line_edit}
+            "codec": codec_combobox_value, "file_path": file_path_line_edit,
+            "scratch_path": self.scratch_line_edit.text(),
+            "show_run_summary": self.show_run_summary_action.isChecked()}
             
         else:
-            data_to_write_dict = {"quality": "100", "format": "", "codec": "", "file_path": ""}
+            data_to_write_dict = {"quality": "100", "format": "", "codec": "", "file_path": "", "scratch_path": ""}
+            self.scratch_line_edit.setText(data_to_write_dict["scratch_path"])
             self.quality_value_line_edit.setText(data_to_write_dict["quality"])
             self.format_combo_box.setCurrentText(data_to_write_dict["format"])
             self.codec_combo_box.setCurrentText(data_to_write_dict["codec"])
@@ -359,7 +577,7 @@ class PlayblastUI(QtWidgets.QDialog):
         '''
         Gets the right scene name
         '''
-        return self.output_file_name_line_edit.text() if self.output_file_name_line_edit.text() != "" else pm.sceneName().namebase if pm.sceneName().namebase != "" else "output"
+        return self.output_file_name_line_edit.text() or brain.PlayblastFuncs.get_scene_name() or "output"
 
     def get_extension_from_selection(self):
         '''
@@ -370,169 +588,153 @@ class PlayblastUI(QtWidgets.QDialog):
             extension = ''
         return extension
 
-    def compile_playblasts(self, temp_playblast_path, final_playblast_path, all_playblasts_list):
-        base_command = self.base_command
-        audio_file = brain.PlayblastFuncs.get_audio(self.add_audio_checkbox)
-        if len(all_playblasts_list) > 1:
-            for i in all_playblasts_list:
-                base_command = '{0} -i "{1}" '.format(base_command, i)
-            base_command += '-filter_complex "'
-            for index, i in enumerate(all_playblasts_list):
-                width = -1
-                height = 720
-                if index > 0:
-                    height = height/2
-                if len(all_playblasts_list) == 3:
-                    base_command += '[{0}]scale={1}:{2}[v{0}];'.format(index, width, height)
-                
-                else:
-                    base_command += '[{}:v]'.format(index)
-            filter_layout = self.three_layout_maps if len(all_playblasts_list) == 3 else self.normal_layout_maps
-            for index, i in enumerate(all_playblasts_list):
-                if len(all_playblasts_list)==3:
-                    base_command += '[v{}]'.format(index)
-                if index == (len(all_playblasts_list)-1):
-                    base_command += 'xstack=inputs={}:layout={}[v]" -map "[v]" -c:v libx264 -y "{}"'.format(len(all_playblasts_list), "|".join(filter_layout[:len(all_playblasts_list)]), temp_playblast_path)
-            self.run_ffmpeg_command(base_command)
-                
-        elif len(all_playblasts_list) == 1:
-            temp_playblast_path = all_playblasts_list[0]
-            if not audio_file:
-                if '%4d' in temp_playblast_path:
-                    base_command += '-i "{}" -y "{}"'.format(temp_playblast_path, final_playblast_path)
-                    if not self.run_ffmpeg_command(base_command):
-                        temp_playblast_path = final_playblast_path
-                else:
-                    try:
-                        shutil.copy(temp_playblast_path, final_playblast_path)
-                    except:
-                        final_playblast_path = temp_playblast_path
-
-        if audio_file:
-            self.add_audio_to_video(audio_file, temp_playblast_path, final_playblast_path)
-            all_playblasts_list.append(temp_playblast_path)
-
-        return all_playblasts_list
-
-
+    def get_playblast_settings(self):
+        '''
+        gets the playblast settings from the widgets
+        '''
+        return pipeline.PlayblastSettings(
+            output_dir=self.file_input_line_edit.text(),
+            scratch_dir=self.scratch_line_edit.text(),
+            scene_name=self.get_scene_name(),
+            cameras=self.get_selected_cameras(),
+            start_frame=self.start_range.value(),
+            end_frame=self.end_range.value(),
+            resolution=self.resolution_combo_box.currentText(),
+            layout=self.layout_combo_box.currentText(),
+            capture_at_tile_size=self.tile_size_checkbox.isChecked(),
+            quality=int(self.quality_value_line_edit.text() or 0),
+            format=self.format_combo_box.currentText(),
+            codec=self.codec_combo_box.currentText(),
+            intermediate=self.intermediate_combo_box.currentText(),
+            encoder_profile=self.encoder_combo_box.currentText(),
+            encoder_threads=self.encoder_threads_spin_box.value(),
+            parallel_encodes=self.parallel_encodes_spin_box.value(),
+            deliverables=[i.text() for i in self.deliverable_checkboxes if i.isChecked()],
+            include_audio=self.add_audio_checkbox.isChecked(),
+            view_polygons=self.view_polys_checkbox.isChecked(),
+            capture_profile=self.capture_profile_combo_box.currentText(),
+            capture_mode=self.capture_mode_combo_box.currentText(),
+            workers=self.workers_spin_box.value(),
+            use_cache=self.use_cache_checkbox.isChecked(),
+            cache_size=self.cache_size_spin_box.value(),
+            profile_frames=self.profile_frames_checkbox.isChecked())
 
     def take_playblast(self):
         '''
-        takes playblast as per user settings
-        '''
-        if not self.file_input_line_edit.text():
-            return pm.confirmDialog(icon='warning', title='Warning', message='File Path is empty.\nPlease give a file path')
-        selected_cam_items = self.camera_list_widget.selectedItems()
-        if not selected_cam_items:
-            return pm.confirmDialog(icon='warning', title='Warning', message='Please select atleast 1 camera')
-        if len(selected_cam_items) > 4:
-            return pm.confirmDialog(icon='warning', title='Warning', message='You can select Maximum upto 4 cameras')
-        extension = self.get_extension_from_selection()
-        start_frame = self.start_range.value()
-        end_frame = self.end_range.value()
-        all_playblasts = []
-        scene_name = self.get_scene_name()
-        _format = self.format_combo_box.currentText()
-        width, height = self.resolution_combo_box.currentText().split('x')
-
-        for cam in selected_cam_items:
-            pm.lookThru(cam.text())
-            all_panels = pm.getPanel(vis=1)
-
-            if _format not in ('image',):                        
-                playblast_path = "{}/{}_{}.{}".format(self.file_input_line_edit.text(), scene_name, cam.text(), extension)
-            else:
-                playblast_path = "{}/{}_{}".format(self.file_input_line_edit.text(), scene_name, cam.text())
-
-            if self.view_polys_checkbox.isChecked():
-                for panel in all_panels:
-                    if pm.modelPanel(panel, q=1, ex=1) == 1:
-                        pm.modelEditor(panel, e=1, allObjects=False)
-                        pm.modelEditor(panel, e=1, polymeshes=True)
-                        break
-            output = pm.playblast(f=playblast_path,
-                        st=start_frame, 
-                        et=end_frame,
-                        qlt=int(self.quality_value_line_edit.text()), 
-                        fmt=self.format_combo_box.currentText(),
-                        c=self.codec_combo_box.currentText(),
-                        fo=1,
-                        v=0,
-                        os=1,
-                        w=int(width),
-                        h=int(height))
-                        
-            if '.####.' in output:
-                output = output.replace('.####.', '.%4d.')
-            all_playblasts.append(output)
-
-        final_playblast_path = "{}/{}.{}".format(self.file_input_line_edit.text(), self.get_scene_name(), extension)
-        self.make_final_playblast(final_playblast_path, all_playblasts)
-
-    def make_final_playblast(self, final_playblast_path, all_playblasts):
-        '''
-        takes playblast as per user settings
-        '''
-        extension = self.get_extension_from_selection()
-        scene_name = self.get_scene_name()
-        
-        audio_file = brain.PlayblastFuncs.get_audio(self.add_audio_checkbox)
-        if audio_file:
-            temp_playblast_path = "{}/temp_{}.{}".format(self.file_input_line_edit.text(), scene_name, extension)
-        else:
-            temp_playblast_path = final_playblast_path
-
-        all_playblasts = self.compile_playblasts(temp_playblast_path, final_playblast_path, all_playblasts)
-        os.startfile(final_playblast_path)
-
-        for i in list(set(all_playblasts)):
-            if '%4d' in i:
-                self.delete_image_sequences(i)
-            else:
-                self.remove_file(i)
+        queues a playblast as per user settings, a draft of it first if asked
+        for, captured once maya is idle and compiled in the background
+        '''
+        settings = self.get_playblast_settings()
+        queued_settings = [settings]
+        if self.draft_checkbox.isChecked():
+            queued_settings.insert(0, settings.get_draft_settings(self.draft_step_spin_box.value()))
+        try:
+            for i in queued_settings:
+                i.validate()
+        except pipeline.PlayblastError as e:
+            return brain.PlayblastFuncs.confirm_dialog('Warning', str(e), 'warning')
 
-    def delete_image_sequences(self, image_playblast_path):
-        all_paths = glob.glob(image_playblast_path.replace('%4d', '*'))
-        for i in all_paths:
-            self.remove_file(i)
+        for i in queued_settings:
+            self.playblast_queue.submit(i, draft=i is not settings)
 
-    def remove_file(self, file_path):
-        try:
-            os.remove(file_path)
-        except Exception as e:
-            pm.displayWarning("Cannot delete the {}".format(file_path))
+    def show_job(self, job):
+        '''
+        shows the status of a playblast job in the job list
+        '''
+        item = self.job_items.get(job)
+        if item is None:
+            item = QtWidgets.QListWidgetItem()
+            item.setData(Qt.UserRole, job)
+            item.setToolTip(job.settings.final_playblast_path)
+            self.jobs_list_widget.addItem(item)
+            self.job_items[job] = item
+        item.setText(job.get_label())
+        self.show_progress()
+
+    def show_progress(self, *args):
+        '''
+        shows the progress of the selected playblast job, or of the one
+        running, with the encoding stats reported by ffmpeg
+        '''
+        selected_jobs = [item.data(Qt.UserRole) for item in self.jobs_list_widget.selectedItems()]
+        running_jobs = [job for job in self.playblast_queue.jobs if job.status in ('Capturing', 'Compiling')]
+        job = (selected_jobs or running_jobs or [None])[0]
+        self.progress_bar.setVisible(job is not None)
+        self.progress_label.setVisible(job is not None)
+        if job is None:
+            return
+        self.progress_bar.setValue(100 if job.status == 'Done' else job.percent)
+        stats = job.stats
+        if job.status == 'Compiling' and stats:
+            self.progress_label.setText("{} : Frame {} at {:.1f} fps, {:.2f}x, {}".format(job.name, stats.get('frame', 0), stats.get('fps', 0.0), stats.get('speed', 0.0), stats.get('out_time', '')))
+        else:
+            self.progress_label.setText(job.get_label())
 
-    
-    def add_audio_to_video(self, audio_path, video_path, output_path):
+    def finish_job(self, job):
         '''
-        adds the audio to given video
+        opens the playblast of a done job and shows why a job failed
         '''
-        audio_base_command = self.base_command
-        audio_video_merge_command = "{} -i {} -i {} -y {}" .format(audio_base_command, audio_path, video_path, output_path)
-        return self.run_ffmpeg_command(audio_video_merge_command)
-    
-    def run_ffmpeg_command(self, command_to_run):
+        if job.status == 'Done':
+            os.startfile(job.settings.final_playblast_path)
+        elif job.status == 'Failed' and job.error_text:
+            brain.PlayblastFuncs.confirm_dialog('Error', 'Following error occurred while taking {} \n{}'.format(job.name, job.error_text), 'critical')
+        if job.playblaster and self.show_run_summary_action.isChecked():
+            brain.PlayblastFuncs.confirm_dialog('Run Summary', job.playblaster.run_log.get_summary())
+        if job.playblaster and job.playblaster.frame_profile and job.playblaster.frame_profile.samples:
+            self.show_frame_profile(job)
+
+    def show_frame_profile(self, job):
+        '''
+        shows the histogram of the frame times and the slowest frames and
+        cameras of a profiled playblast
+        '''
+        report = job.playblaster.frame_profile.get_report()
+        profile_dialog = QtWidgets.QDialog(self)
+        profile_dialog.setWindowTitle("Frame Profile : {}".format(job.name))
+        profile_dialog.resize(520, 480)
+        dialog_layout = QtWidgets.QVBoxLayout()
+        histogram_lines = ['{} frames, evaluation {:.2f}s, readback {:.2f}s'.format(report['frames'], report['evaluation'], report['readback'])]
+        for bucket in report['histogram']:
+            if bucket['count']:
+                label = '>= {:g} ms'.format(bucket['from'] * 1000) if bucket['to'] is None else '< {:g} ms'.format(bucket['to'] * 1000)
+                histogram_lines.append('{} : {}'.format(label, bucket['count']))
+        dialog_layout.addWidget(QtWidgets.QLabel('\n'.join(histogram_lines)))
+
+        tables = ((['Frame', 'Eval ms', 'Readback ms', 'Total ms', 'Slowest Camera'], report['slowest_frames'], ('frame', 'evaluation', 'readback', 'total', 'slowest_camera')),
+                  (['Camera', 'Eval ms', 'Readback ms', 'Mean ms'], report['slowest_cameras'], ('camera', 'evaluation', 'readback', 'mean')))
+        for headers, rows, keys in tables:
+            table_widget = QtWidgets.QTableWidget(len(rows), len(headers))
+            table_widget.setHorizontalHeaderLabels(headers)
+            table_widget.setEditTriggers(QAbstractItemView.NoEditTriggers)
+            for row, values in enumerate(rows):
+                for column, key in enumerate(keys):
+                    value = values[key]
+                    text = '{:.1f}'.format(value * 1000) if isinstance(value, float) else str(value or '')
+                    table_widget.setItem(row, column, QtWidgets.QTableWidgetItem(text))
+            dialog_layout.addWidget(table_widget)
+        profile_dialog.setLayout(dialog_layout)
+        profile_dialog.exec_()
+
+    def cancel_compile(self, *args):
         '''
-        runs the ffmpeg compilation headless command
+        cancels the selected playblast jobs, or every one of them
         '''
+        selected_jobs = [item.data(Qt.UserRole) for item in self.jobs_list_widget.selectedItems()]
+        if not selected_jobs:
+            return self.playblast_queue.cancel()
+        for job in selected_jobs:
+            self.playblast_queue.cancel(job)
 
-        try:
-            if _PLATFORM_ == 'Darwin':
-                env = {'PATH': '/usr/local/bin:/usr/bin:/bin'}
-                process = subprocess.Popen(command_to_run, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                stdout, stderr = process.communicate()
-                process.wait()
-                return True
-            else:
-                si = subprocess.STARTUPINFO()
-                si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                process = subprocess.Popen(command_to_run, startupinfo= si)
-                process.communicate()
-                process.wait()
-                return True
-        except Exception as e:
-            pm.confirmDialog(icon = 'critical', title = 'Error', message = 'Following error occurred while compiling video \n{}'.format(e))
-            return False
+    def clear_finished_jobs(self, *args):
+        '''
+        removes the finished playblast jobs from the job list
+        '''
+        for job, item in list(self.job_items.items()):
+            if job.is_finished():
+                self.jobs_list_widget.takeItem(self.jobs_list_widget.row(item))
+                del self.job_items[job]
+        self.playblast_queue.clear_finished()
+        self.show_progress()
 
 def main():
     delete_widget_instances(main_maya_win(), __TOOL_NAME__)
@@ -1,8 +1,35 @@
-import pymel.core as pm
-if "2016" in pm.about(v=1):
-    from PySide import QtGui as QtWidgets
-else:
-    from PySide2 import QtWidgets
+import ANgularBackend as backend
+
+_ENCODER_PROFILES_ = {
+    'Draft': {'preset': 'ultrafast', 'tune': 'zerolatency', 'crf': 28, 'gop_seconds': 1},
+    'Review': {'preset': 'veryfast', 'tune': None, 'crf': 23, 'gop_seconds': 1},
+    'Final': {'preset': 'medium', 'tune': None, 'crf': 18, 'gop_seconds': 2},
+}
+
+_CAPTURE_PROFILES_ = {
+    'As Viewport': {},
+    'Fast': {
+        'editor': {'displayTextures': False, 'shadows': False, 'headsUpDisplay': False, 'grid': False,
+                   'manipulators': False, 'nurbsCurves': False, 'joints': False, 'ikHandles': False,
+                   'locators': False, 'lights': False, 'cameras': False, 'dimensions': False,
+                   'handles': False, 'motionTrails': False},
+        'renderer': {'ssaoEnable': 0, 'multiSampleEnable': 0, 'motionBlurEnable': 0, 'lineAAEnable': 0},
+    },
+    'Polygons Only': {
+        'editor': {'allObjects': False, 'polymeshes': True, 'displayTextures': False, 'shadows': False,
+                   'headsUpDisplay': False, 'grid': False, 'manipulators': False},
+        'renderer': {'ssaoEnable': 0, 'multiSampleEnable': 0, 'motionBlurEnable': 0, 'lineAAEnable': 0},
+    },
+}
+_CAPTURE_PROFILES_['Fast Cached'] = dict(_CAPTURE_PROFILES_['Fast'], evaluation={'mode': 'parallel', 'cached_playback': True})
+
+_DELIVERABLES_ = {
+    'Proxy': {'kind': 'Composite', 'suffix': '_proxy', 'scale': 0.5, 'extension': 'mp4', 'encoder_profile': 'Draft'},
+    'ProRes Proxy': {'kind': 'Composite', 'suffix': '_prores', 'scale': 1.0, 'extension': 'mov', 'codec': 'prores_ks', 'codec_options': '-profile:v 0 '},
+    'Per Camera': {'kind': 'Cameras', 'suffix': '', 'scale': 1.0},
+    'Contact Sheet': {'kind': 'Contact Sheet', 'suffix': '_contact', 'columns': 4, 'rows': 4, 'extension': 'jpg'},
+}
+
 class PlayblastFuncs():
 
     @staticmethod
@@ -10,7 +37,7 @@ class PlayblastFuncs():
         '''
         Used to set output folder for playblast
         '''
-        selected_file = QtWidgets.QFileDialog.getExistingDirectory (None,"Select Output Folder")
+        selected_file = backend.get_backend().browse_directory("Select Output Folder")
         return selected_file if selected_file else ""
 
     @staticmethod
@@ -19,23 +46,43 @@ class PlayblastFuncs():
         gives a list of all existing cameras in the scene file to
         populate in the camera combo box
         '''
-        return pm.listCameras()
+        return backend.get_backend().list_cameras()
+
+    @staticmethod
+    def get_camera_infos():
+        '''
+        gives the name, namespace and reference of every camera of the scene
+        '''
+        return backend.get_backend().list_camera_infos()
 
     @staticmethod
     def get_frame_range():
         '''
         gets the start and end fframe ranges
         '''
-        start_frame = pm.playbackOptions(query=1, minTime=1)
-        end_frame = pm.playbackOptions(query=1, maxTime=1)
+        start_frame, end_frame = backend.get_backend().get_playback_range()
         return start_frame, end_frame
 
+    @staticmethod
+    def get_fps():
+        '''
+        gets the frames per second of the scene time unit
+        '''
+        return backend.get_backend().get_fps()
+
+    @staticmethod
+    def get_maya_version():
+        '''
+        gets the version of the running maya, e.g. 2022.3
+        '''
+        return backend.get_backend().get_maya_version()
+
     @staticmethod
     def get_playblast_formats():
         '''
         gets all the available formats of playblasting
         '''
-        return pm.playblast(q=1,format=1)
+        return backend.get_backend().get_playblast_formats()
 
     @staticmethod
     def get_codecs(in_format):
@@ -46,18 +93,18 @@ class PlayblastFuncs():
             return ('jpg', 'tiff', 'png', 'tga', 'bmp') 
         if in_format in ('qt'):
             return ('H.264',)
-        return pm.mel.eval('playblast -format "{0}" -q -compression;'.format(in_format))
+        return backend.get_backend().get_playblast_codecs(in_format)
 
     @staticmethod
-    def get_audio(checkbox_checked):
+    def get_audio(include_audio):
         '''
         gets the first audio file from maya scene
         '''
-        if not checkbox_checked.isChecked():
+        if not include_audio:
             return
-        audios = pm.ls(type='audio')
+        audios = backend.get_backend().get_audio_files()
         if audios:
-            return audios[0].filename.get()
+            return audios[0]
 
     @staticmethod
     def get_video_extension(codec):
@@ -76,3 +123,218 @@ class PlayblastFuncs():
         gives list of video resolution
         '''
         return ('1920x1080', '1280x720', '720x560', '640x480',)
+
+    @staticmethod
+    def get_capture_modes():
+        '''
+        gives list of the ways cameras can be captured
+        Sequential : playblasts every camera one after another and compiles them
+        Multi-view : steps the timeline once, capturing every camera at each frame
+        Streaming : pipes every captured frame straight into the final playblast
+        Parallel : captures a snapshot of the scene in headless mayapy workers,
+                   as saved and at full quality
+        '''
+        return ('Sequential', 'Multi-view', 'Streaming', 'Parallel',)
+
+    @staticmethod
+    def get_scene_name():
+        '''
+        gets the name of the open scene file, empty for an untitled scene
+        '''
+        return backend.get_backend().get_scene_name()
+
+    @staticmethod
+    def run_when_idle(func):
+        '''
+        calls func on the main thread of maya once it is idle
+        '''
+        backend.get_backend().run_when_idle(func)
+
+    @staticmethod
+    def look_through(camera):
+        '''
+        makes the active model panel look through the camera
+        '''
+        backend.get_backend().look_through(camera)
+
+    @staticmethod
+    def playblast(**kwargs):
+        '''
+        takes a playblast with the given maya playblast flags
+        '''
+        return backend.get_backend().playblast(**kwargs)
+
+    @staticmethod
+    def get_current_time():
+        return backend.get_backend().get_current_time()
+
+    @staticmethod
+    def set_current_time(frame):
+        backend.get_backend().set_current_time(frame)
+
+    @staticmethod
+    def get_capture_profiles():
+        '''
+        gives list of the viewport profiles the cameras are captured with
+        As Viewport : captures the viewport as it is
+        Fast : no textures, shadows, HUD, AO, AA or motion blur and no curves,
+               joints, locators, lights or cameras
+        Fast Cached : Fast with parallel evaluation and cached playback
+        Polygons Only : only the polygons, without textures and shadows
+        '''
+        return ('As Viewport', 'Fast', 'Fast Cached', 'Polygons Only',)
+
+    @staticmethod
+    def apply_capture_profile(profile, view_polygons=False, panels=None):
+        '''
+        applies the capture profile to the model panels, or to the panel
+        playblast captures from, and gives back what restore_capture_profile
+        needs to put them back as they were
+        '''
+        profile_settings = _CAPTURE_PROFILES_.get(profile, {})
+        editor_flags = dict(profile_settings.get('editor', {}))
+        if view_polygons:
+            editor_flags.update(allObjects=False, polymeshes=True)
+        scene_backend = backend.get_backend()
+        return scene_backend.apply_capture_profile(panels or [scene_backend.get_capture_panel()], editor_flags,
+                                                   profile_settings.get('renderer', {}), profile_settings.get('evaluation', {}))
+
+    @staticmethod
+    def restore_capture_profile(state):
+        backend.get_backend().restore_capture_profile(state)
+
+    @staticmethod
+    def display_warning(message):
+        backend.get_backend().display_warning(message)
+
+    @staticmethod
+    def confirm_dialog(title, message, icon=None):
+        '''
+        shows a maya confirm dialog with the message
+        '''
+        return backend.get_backend().confirm_dialog(title, message, icon)
+
+    @staticmethod
+    def save_scene_snapshot(snapshot_path):
+        '''
+        saves the current state of the scene, unsaved changes included, to the
+        given maya ascii file without renaming the open scene
+        '''
+        return backend.get_backend().export_snapshot(snapshot_path)
+
+    @staticmethod
+    def create_capture_panels(cameras, width, height):
+        '''
+        creates a window holding one model panel looking through each camera,
+        so every camera can be captured without switching the camera of a panel
+        '''
+        return backend.get_backend().create_capture_panels(cameras, width, height)
+
+    @staticmethod
+    def delete_capture_panels(window, panels):
+        '''
+        deletes the capture window and its model panels
+        '''
+        backend.get_backend().delete_capture_panels(window, panels)
+
+    @staticmethod
+    def capture_frame(frame, image_path, width, height, quality, compression='bmp', panel=None):
+        '''
+        captures a single frame of the given model panel, or the current view,
+        to the given image path
+        '''
+        panel_flags = {'editorPanelName': panel} if panel else {}
+        return backend.get_backend().playblast(frame=[frame],
+                    completeFilename=image_path,
+                    fmt='image',
+                    c=compression,
+                    qlt=quality,
+                    fo=1,
+                    v=0,
+                    os=1,
+                    p=100,
+                    w=width,
+                    h=height,
+                    **panel_flags)
+
+    @staticmethod
+    def get_camera_attributes(camera):
+        '''
+        gets the lens and film back attributes of the camera shape
+        '''
+        return backend.get_backend().get_camera_attributes(camera)
+
+    @staticmethod
+    def get_scene_state(cameras=()):
+        '''
+        gets the scene state the capture cache compares its frames with
+        static : hash of the nodes, of the attributes without an input
+                 connection and of the driven keys, a change of which makes
+                 every frame stale
+        curves : keys and infinities of every time based animation curve,
+                 compared key by key to find the stale frames
+        cameras : static hash and curves of each of the given cameras, left
+                  out of the two above
+        '''
+        return backend.get_backend().get_scene_state(cameras)
+
+    @staticmethod
+    def get_layouts():
+        '''
+        gives list of the ways cameras can be laid out in the final playblast
+        '''
+        return ('Auto', 'Grid', 'Focus', 'Row',)
+
+    @staticmethod
+    def get_intermediates():
+        '''
+        gives list of the formats cameras are captured to before compiling
+        Display Settings : the format and codec chosen in the display tab
+        Uncompressed : bmp image sequences, the fastest to write and decode
+        '''
+        return ('Display Settings', 'Uncompressed',)
+
+    @staticmethod
+    def get_encoder_profiles():
+        '''
+        gives list of the encoder profiles of the final playblast
+        Auto : picks the profile from the quality
+        Draft : fastest encode for quick iterations, biggest files
+        Review : fast encode with a good quality for dailies
+        Final : slower encode with the best quality and smaller files
+        '''
+        return ('Auto', 'Draft', 'Review', 'Final',)
+
+    @staticmethod
+    def get_deliverables():
+        '''
+        gives list of the extra outputs compiled along with the final playblast
+        Proxy : the composite at half size, quickly encoded for web review
+        ProRes Proxy : the composite as a ProRes 422 Proxy movie for editorial
+        Per Camera : a movie of every camera
+        Contact Sheet : a grid image of frames spread over the frame range
+        '''
+        return ('Proxy', 'ProRes Proxy', 'Per Camera', 'Contact Sheet',)
+
+    @staticmethod
+    def get_deliverable(name):
+        '''
+        gets the kind, file name suffix, scale, extension and encoder of a
+        deliverable, None for an unknown one
+        '''
+        return dict(_DELIVERABLES_[name]) if name in _DELIVERABLES_ else None
+
+    @staticmethod
+    def get_encoder_options(profile, quality, fps, threads=0):
+        '''
+        gets the libx264 options of the encoder profile, Auto maps the 0-100
+        quality onto Draft, Review and Final. threads 0 lets x264 decide.
+        '''
+        if profile not in _ENCODER_PROFILES_:
+            profile = 'Draft' if int(quality) < 40 else 'Review' if int(quality) < 80 else 'Final'
+        settings = _ENCODER_PROFILES_[profile]
+        options = '-preset {} '.format(settings['preset'])
+        if settings['tune']:
+            options += '-tune {} '.format(settings['tune'])
+        options += '-crf {} -threads {} -g {} '.format(settings['crf'], int(threads), max(1, int(round(float(fps) * settings['gop_seconds']))))
+        return options
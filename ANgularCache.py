@@ -0,0 +1,211 @@
+'''
+capture cache for ANgular
+
+Captured frames are stored per camera in a directory named after a hash of
+everything that changes the look of a capture (camera, resolution, quality,
+image format...). Each entry remembers the scene state it was captured
+against, so that only the frames touched by changed animation curves need to
+be captured again. Entries are evicted least recently used first once the
+cache grows over its size budget.
+'''
+import os
+import glob
+import json
+import time
+import shutil
+import hashlib
+
+_META_FILE_ = 'meta.json'
+_FRAME_PREFIX_ = 'frame'
+_CYCLIC_INFINITIES_ = (3, 4, 5)
+
+
+def make_key(*parts):
+    '''
+    gets the content hash of the given json serializable parts
+    '''
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def get_curve_dirty_interval(old_keys, new_keys):
+    '''
+    gets the (start, end) frame interval changed between two versions of the
+    keys of an animation curve, a bound is None when it reaches the infinity
+    '''
+    old_set = set(tuple(key) for key in old_keys)
+    new_set = set(tuple(key) for key in new_keys)
+    changed_times = [key[0] for key in old_set.symmetric_difference(new_set)]
+    if not changed_times:
+        return None
+    all_times = sorted(set(key[0] for key in old_set.union(new_set)))
+    first_changed, last_changed = min(changed_times), max(changed_times)
+    before = [key_time for key_time in all_times if key_time < first_changed]
+    after = [key_time for key_time in all_times if key_time > last_changed]
+    return (before[-1] if before else None, after[0] if after else None)
+
+
+def get_dirty_intervals(old_curves, new_curves):
+    '''
+    gets the frame intervals changed between two states of the scene animation
+    curves, as made by ANgularBrain.PlayblastFuncs.get_scene_state. A changed
+    curve cycling or oscillating past its keys changes every frame.
+    '''
+    intervals = []
+    for curve in set(old_curves).union(new_curves):
+        old_curve, new_curve = old_curves.get(curve), new_curves.get(curve)
+        if old_curve == new_curve:
+            continue
+        if not old_curve or not new_curve or old_curve['infinity'] != new_curve['infinity']:
+            return [(None, None)]
+        if any(infinity in _CYCLIC_INFINITIES_ for infinity in new_curve['infinity']):
+            return [(None, None)]
+        interval = get_curve_dirty_interval(old_curve['keys'], new_curve['keys'])
+        if interval:
+            intervals.append(interval)
+    return intervals
+
+
+def get_camera_state(scene_state, camera):
+    '''
+    gets the part of the scene state the captures of the camera depend on, the
+    curves of the camera itself along with the ones of the rest of the scene
+    '''
+    camera_state = scene_state.get('cameras', {}).get(camera, {})
+    curves = dict(scene_state['curves'])
+    curves.update(camera_state.get('curves', {}))
+    return {'static': scene_state['static'], 'curves': curves}
+
+
+def is_frame_dirty(frame, intervals):
+    for start, end in intervals:
+        if (start is None or frame >= start) and (end is None or frame <= end):
+            return True
+    return False
+
+
+class CaptureCache(object):
+    '''
+    directory of cached per camera image sequences with a size budget in bytes
+    '''
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get_entry_dir(self, key):
+        entry_dir = os.path.join(self.cache_dir, key)
+        if not os.path.exists(entry_dir):
+            os.makedirs(entry_dir)
+        return entry_dir
+
+    def get_sequence_path(self, key, extension):
+        '''
+        gets the ffmpeg image sequence path of the cached frames
+        '''
+        return '{}/{}.%4d.{}'.format(self.get_entry_dir(key), _FRAME_PREFIX_, extension)
+
+    def get_capture_path(self, key):
+        '''
+        gets the playblast file name the frames of the entry are captured to
+        '''
+        return '{}/{}'.format(self.get_entry_dir(key), _FRAME_PREFIX_)
+
+    def get_cached_frames(self, key, extension):
+        '''
+        gets the frame numbers cached in the entry as a {frame: path} dictionary
+        '''
+        prefix = os.path.join(self.get_entry_dir(key), '{}.'.format(_FRAME_PREFIX_))
+        suffix = '.{}'.format(extension)
+        cached_frames = {}
+        for image_path in glob.glob('{}*{}'.format(prefix, suffix)):
+            frame = image_path[len(prefix):len(image_path) - len(suffix)]
+            if frame.lstrip('-').isdigit():
+                cached_frames[int(frame)] = image_path
+        return cached_frames
+
+    def read_meta(self, key):
+        meta_path = os.path.join(self.get_entry_dir(key), _META_FILE_)
+        if not os.path.exists(meta_path):
+            return {}
+        try:
+            with open(meta_path, 'r') as reader:
+                return json.load(reader)
+        except ValueError:
+            return {}
+
+    def get_frames_to_capture(self, key, extension, scene_state, start_frame, end_frame):
+        '''
+        gets the frames of the range missing from the entry or made stale by the
+        changes of the scene state, stale frames are removed from the entry
+        '''
+        meta = self.read_meta(key)
+        cached_frames = self.get_cached_frames(key, extension)
+        if not meta or meta.get('static') != scene_state['static']:
+            intervals = [(None, None)]
+        else:
+            intervals = get_dirty_intervals(meta.get('curves', {}), scene_state['curves'])
+        for frame, image_path in list(cached_frames.items()):
+            if is_frame_dirty(frame, intervals):
+                os.remove(image_path)
+                del cached_frames[frame]
+        return [frame for frame in range(start_frame, end_frame + 1) if frame not in cached_frames]
+
+    def link_frames(self, key, extension, start_frame, end_frame, image_path_template):
+        '''
+        hardlinks the cached frames of the range to the %04d image_path_template,
+        or copies them where links are not supported, so they stay intact while
+        compiled if the entry is captured again or evicted. Stale frames are
+        removed before being captured again, never rewritten in place.
+        '''
+        cached_frames = self.get_cached_frames(key, extension)
+        for frame in range(start_frame, end_frame + 1):
+            if frame not in cached_frames:
+                continue
+            image_path = image_path_template % frame
+            try:
+                os.link(cached_frames[frame], image_path)
+            except (AttributeError, OSError):
+                shutil.copy2(cached_frames[frame], image_path)
+
+    def commit(self, key, scene_state):
+        '''
+        records the scene state the entry is now valid for, and marks it as used
+        '''
+        meta = {'static': scene_state['static'], 'curves': scene_state['curves'], 'last_used': time.time()}
+        with open(os.path.join(self.get_entry_dir(key), _META_FILE_), 'w') as writer:
+            json.dump(meta, writer)
+
+    def get_entries(self):
+        '''
+        gets (last_used, size_in_bytes, key) of every entry
+        '''
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, key)
+            if not os.path.isdir(entry_dir):
+                continue
+            size = sum(os.path.getsize(os.path.join(entry_dir, i)) for i in os.listdir(entry_dir))
+            entries.append((self.read_meta(key).get('last_used', 0), size, key))
+        return entries
+
+    def evict(self, keep_keys=()):
+        '''
+        removes the least recently used entries until the cache fits its budget
+        '''
+        entries = sorted(self.get_entries())
+        total_size = sum(size for last_used, size, key in entries)
+        for last_used, size, key in entries:
+            if total_size <= self.max_bytes:
+                break
+            if key in keep_keys:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            total_size -= size
+
+    def clear(self):
+        '''
+        removes every cached entry
+        '''
+        for key in os.listdir(self.cache_dir):
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
@@ -0,0 +1,131 @@
+'''
+camera browser models of ANgular
+
+CameraModel lists the cameras of the scene, filling itself a batch at a time
+so thousands of cameras never block the dialog, and follows the cameras
+added or deleted in the scene without listing them all again.
+CameraFilterModel filters it by name, namespace or reference as one types.
+'''
+try:
+    from PySide2 import QtCore
+    QSortFilterProxyModel = QtCore.QSortFilterProxyModel
+except ImportError:
+    from PySide import QtCore, QtGui
+    QSortFilterProxyModel = QtGui.QSortFilterProxyModel
+
+import ANgularBrain as brain
+import ANgularBackend as backend
+
+NamespaceRole = QtCore.Qt.UserRole + 1
+ReferenceRole = QtCore.Qt.UserRole + 2
+_BATCH_SIZE_ = 500
+
+
+class CameraModel(QtCore.QAbstractListModel):
+    '''
+    list model of the {"name", "namespace", "reference"} camera infos
+    '''
+    def __init__(self, parent=None):
+        super(CameraModel, self).__init__(parent)
+        self.cameras = []
+        self.pending_cameras = []
+        self.callback_ids = []
+        self.batch_timer = QtCore.QTimer(self)
+        self.batch_timer.setInterval(0)
+        self.batch_timer.timeout.connect(self.add_batch)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.cameras)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        camera = self.cameras[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return camera['name']
+        if role == QtCore.Qt.ToolTipRole:
+            return camera['reference'] or camera['name']
+        if role == NamespaceRole:
+            return camera['namespace']
+        if role == ReferenceRole:
+            return camera['reference']
+        return None
+
+    def refresh(self):
+        '''
+        lists the cameras of the scene again and fills the model a batch at a time
+        '''
+        self.batch_timer.stop()
+        self.beginResetModel()
+        self.cameras = []
+        self.endResetModel()
+        self.pending_cameras = brain.PlayblastFuncs.get_camera_infos()
+        self.batch_timer.start()
+
+    def add_batch(self):
+        if not self.pending_cameras:
+            return self.batch_timer.stop()
+        batch = self.pending_cameras[:_BATCH_SIZE_]
+        del self.pending_cameras[:_BATCH_SIZE_]
+        self.beginInsertRows(QtCore.QModelIndex(), len(self.cameras), len(self.cameras) + len(batch) - 1)
+        self.cameras.extend(batch)
+        self.endInsertRows()
+
+    def add_camera(self, camera):
+        if any(i['name'] == camera['name'] for i in self.cameras + self.pending_cameras):
+            return
+        self.beginInsertRows(QtCore.QModelIndex(), len(self.cameras), len(self.cameras))
+        self.cameras.append(camera)
+        self.endInsertRows()
+
+    def remove_camera(self, name):
+        self.pending_cameras = [i for i in self.pending_cameras if i['name'] != name]
+        for row, camera in enumerate(self.cameras):
+            if camera['name'] == name:
+                self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+                del self.cameras[row]
+                self.endRemoveRows()
+                return
+
+    def watch_scene(self):
+        '''
+        follows the cameras added to and deleted from the scene
+        '''
+        if not self.callback_ids:
+            self.callback_ids = backend.get_backend().add_camera_callbacks(self.add_camera, self.remove_camera, self.refresh)
+
+    def unwatch_scene(self):
+        if self.callback_ids:
+            backend.get_backend().remove_callbacks(self.callback_ids)
+            self.callback_ids = []
+
+
+class CameraFilterModel(QSortFilterProxyModel):
+    '''
+    filters the cameras whose name, namespace or reference contains the
+    filter text, case insensitive
+    Filter fields : All, Name, Namespace, Reference
+    '''
+    filter_fields = ('All', 'Name', 'Namespace', 'Reference',)
+
+    def __init__(self, parent=None):
+        super(CameraFilterModel, self).__init__(parent)
+        self.filter_text = ''
+        self.filter_field = 'All'
+
+    def set_filter(self, filter_text=None, filter_field=None):
+        if filter_text is not None:
+            self.filter_text = filter_text.lower()
+        if filter_field is not None:
+            self.filter_field = filter_field
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self.filter_text:
+            return True
+        camera = self.sourceModel().cameras[source_row]
+        if self.filter_field == 'All':
+            values = (camera['name'], camera['namespace'], camera['reference'])
+        else:
+            values = (camera[self.filter_field.lower()],)
+        return any(self.filter_text in value.lower() for value in values)
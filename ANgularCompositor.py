@@ -0,0 +1,178 @@
+'''
+native compositor of ANgular
+
+    python ANgularCompositor.py composite.json
+
+Lays out uncompressed bmp camera captures with numpy instead of ffmpeg
+filters. Every frame of every camera is memory mapped and copied onto its tile
+of a reused composite buffer, a thread pool assembling several frames at
+once, and the composites are piped as raw video to the ffmpeg encoder.
+numpy is optional, without it the captures are laid out by ffmpeg as usual.
+'''
+import os
+import sys
+import json
+import shlex
+import struct
+import argparse
+import platform
+import subprocess
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_BMP_HEADER_ = struct.Struct('<2sIHHIIiiHHI')
+
+
+def is_available():
+    return numpy is not None
+
+
+def get_python_path():
+    '''
+    gets the python running the compositor, the ANGULAR_PYTHON environment
+    variable overrides the running python, or mayapy inside the maya ui
+    '''
+    if os.environ.get('ANGULAR_PYTHON'):
+        return os.environ['ANGULAR_PYTHON']
+    executable = os.path.basename(sys.executable).lower()
+    if executable.startswith('maya') and not executable.startswith('mayapy'):
+        import ANgularWorker as worker
+        return worker.get_mayapy_path()
+    return sys.executable
+
+
+def read_bmp(path):
+    '''
+    memory maps the pixels of an uncompressed 24 or 32 bit bmp and gives back
+    a top down height x width x 3 array of its bgr pixels
+    '''
+    with open(path, 'rb') as reader:
+        header = reader.read(_BMP_HEADER_.size)
+    magic, file_size, reserved, reserved, offset, header_size, width, height, planes, bits, compression = _BMP_HEADER_.unpack(header)
+    if magic != b'BM' or bits not in (24, 32) or compression not in (0, 3):
+        raise ValueError('{} is not an uncompressed 24 or 32 bit bmp'.format(path))
+    channels = bits // 8
+    row_bytes = (width * channels + 3) // 4 * 4
+    rows = numpy.memmap(path, numpy.uint8, 'r', offset, (abs(height), row_bytes))
+    pixels = rows[:, :width * channels].reshape(abs(height), width, channels)[:, :, :3]
+    return pixels[::-1] if height > 0 else pixels
+
+
+class Compositor(object):
+    '''
+    lays the frames of the %4d bmp sequences out on their (x, y, width,
+    height) tiles of a size (width, height) composite
+    '''
+    def __init__(self, inputs, tiles, size, start_number, frame_count, threads=0):
+        self.inputs = [i.replace('%4d', '%04d') for i in inputs]
+        self.tiles = tiles
+        self.size = size
+        self.start_number = start_number
+        self.frame_count = frame_count
+        self.threads = threads or min(8, multiprocessing.cpu_count())
+
+    def assemble(self, composite, frame_number):
+        for image_path_template, (x, y, width, height) in zip(self.inputs, self.tiles):
+            composite[y:y + height, x:x + width] = read_bmp(image_path_template % frame_number)
+        return composite
+
+    def iter_composites(self):
+        '''
+        yields the composite of every frame in order, the same few buffers
+        being filled again batch after batch
+        '''
+        composites = [numpy.zeros((self.size[1], self.size[0], 3), numpy.uint8) for index in range(self.threads)]
+        pool = ThreadPool(self.threads)
+        try:
+            for batch_start in range(0, self.frame_count, self.threads):
+                frame_numbers = range(self.start_number + batch_start, self.start_number + min(self.frame_count, batch_start + self.threads))
+                for composite in pool.map(lambda args: self.assemble(*args), zip(composites, frame_numbers)):
+                    yield composite
+        finally:
+            pool.close()
+            pool.join()
+
+    def write(self, stream):
+        '''
+        writes every composite to the stream, giving back False if its reader
+        stopped reading before the last one. Errors reading the captures are
+        raised as they are.
+        '''
+        composites = self.iter_composites()
+        try:
+            for composite in composites:
+                try:
+                    stream.write(composite.data)
+                except (IOError, OSError) as e:
+                    sys.stderr.write('ffmpeg stopped reading the composites: {}\n'.format(e))
+                    return False
+        finally:
+            composites.close()
+        return True
+
+
+def build_job(inputs, tiles, size, start_number, frame_count, threads, ffmpeg_path, encode_options):
+    '''
+    gets the json job of a composite, encode_options being the ffmpeg options
+    reading the raw bgr24 composites from stdin and writing the playblast
+    '''
+    return {'inputs': list(inputs), 'tiles': [list(tile) for tile in tiles], 'size': list(size),
+            'start_number': int(start_number), 'frame_count': int(frame_count), 'threads': int(threads),
+            'ffmpeg': ffmpeg_path, 'encode_options': encode_options}
+
+
+def build_compositor_command(python_path, job_path):
+    compositor_script = '{}.py'.format(os.path.splitext(os.path.abspath(__file__))[0])
+    return '"{}" "{}" "{}"'.format(python_path, compositor_script, job_path)
+
+
+def run_job(job, ffmpeg_options=''):
+    '''
+    pipes the composites of the job into its ffmpeg encoder and gives back
+    the return code of ffmpeg, or 1 with ffmpeg killed if a capture cannot be
+    read, so a truncated playblast is never taken for a finished one
+    '''
+    encode_command = '"{}" {}{}'.format(job['ffmpeg'], ffmpeg_options, job['encode_options'])
+    if platform.system() != 'Windows':
+        encode_command = shlex.split(encode_command)
+    process = subprocess.Popen(encode_command, stdin=subprocess.PIPE)
+    compositor = Compositor(job['inputs'], job['tiles'], job['size'], job['start_number'], job['frame_count'], job['threads'])
+    try:
+        compositor.write(process.stdin)
+    except Exception as e:
+        sys.stderr.write('Could not composite the captures: {}\n'.format(e))
+        process.kill()
+        process.wait()
+        return 1
+    finally:
+        try:
+            process.stdin.close()
+        except (IOError, OSError):
+            pass
+    return process.wait()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Lays out bmp camera captures and pipes them to ffmpeg')
+    parser.add_argument('job', help='json composite job')
+    parser.add_argument('-progress', help='passed on to ffmpeg')
+    parser.add_argument('-nostats', action='store_true', help='passed on to ffmpeg')
+    options = parser.parse_args(args)
+
+    with open(options.job, 'r') as reader:
+        job = json.load(reader)
+    ffmpeg_options = ''
+    if options.progress:
+        ffmpeg_options += '-progress {} '.format(options.progress)
+    if options.nostats:
+        ffmpeg_options += '-nostats '
+    return run_job(job, ffmpeg_options)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+'''
+layout planner of ANgular
+
+Works out where every camera goes in the final playblast, for any number of
+cameras, and builds the ffmpeg filter graph stacking them in a single pass.
+'''
+import math
+
+
+def get_even(value):
+    '''
+    rounds a size down to an even number of pixels, as yuv420p needs
+    '''
+    return max(2, int(value) // 2 * 2)
+
+
+def plan_layout(layout, count, width, height):
+    '''
+    gets the (width, height) of the composite and the (x, y, width, height)
+    tile of each of the count cameras
+    Auto : Focus for three cameras, Grid otherwise
+    Grid : rows of cameras filling as square a grid as possible
+    Focus : the first camera big on the left, the others stacked on its right
+    Row : every camera side by side
+    The composite is about width pixels wide, every tile keeps the
+    width:height aspect ratio of the capture.
+    '''
+    aspect = float(width) / height
+    if count == 1:
+        return (get_even(width), get_even(height)), [(0, 0, get_even(width), get_even(height))]
+    if layout == 'Auto':
+        layout = 'Focus' if count == 3 else 'Grid'
+
+    if layout == 'Focus':
+        small_count = count - 1
+        big_width = get_even(width * small_count / float(small_count + 1))
+        big_height = get_even(big_width / aspect)
+        small_height = get_even(big_height / float(small_count))
+        small_width = get_even(small_height * aspect)
+        tiles = [(0, 0, big_width, big_height)]
+        tiles += [(big_width, index * small_height, small_width, small_height) for index in range(small_count)]
+        return (big_width + small_width, big_height), tiles
+
+    if layout == 'Row':
+        columns = count
+    else:
+        columns = int(math.ceil(math.sqrt(count)))
+    rows = int(math.ceil(count / float(columns)))
+    tile_width = get_even(width / float(columns))
+    tile_height = get_even(tile_width / aspect)
+    tiles = [((index % columns) * tile_width, (index // columns) * tile_height, tile_width, tile_height) for index in range(count)]
+    return (tile_width * columns, tile_height * rows), tiles
+
+
+def build_stack_filter(input_labels, input_sizes, tiles, output_label='v', pixel_format='yuv420p'):
+    '''
+    gets the filter graph placing every input label on its tile. Each input is
+    scaled at most once, only when its (width, height) in input_sizes differs
+    from its tile, and converted to the pixel format within that same scale
+    so nothing is converted again after the stack.
+    '''
+    filter_parts = []
+    tile_labels = []
+    for index, (label, size, tile) in enumerate(zip(input_labels, input_sizes, tiles)):
+        x, y, tile_width, tile_height = tile
+        tile_filters = []
+        if not size or tuple(size) != (tile_width, tile_height):
+            tile_filters.append('scale={}:{}'.format(tile_width, tile_height))
+        tile_filters.append('format={}'.format(pixel_format))
+        tile_label = output_label if len(tiles) == 1 else 't{}'.format(index)
+        filter_parts.append('[{}]{}[{}]'.format(label, ','.join(tile_filters), tile_label))
+        tile_labels.append(tile_label)
+    if len(tiles) > 1:
+        stack_layout = '|'.join('{}_{}'.format(tile[0], tile[1]) for tile in tiles)
+        filter_parts.append('{}xstack=inputs={}:layout={}:fill=black[{}]'.format(''.join('[{}]'.format(label) for label in tile_labels), len(tiles), stack_layout, output_label))
+    return ';'.join(filter_parts)
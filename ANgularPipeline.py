@@ -0,0 +1,1098 @@
+'''
+UI free playblast pipeline of ANgular
+
+PlayblastSettings holds everything a playblast needs and Playblaster captures
+the cameras and compiles them into the final playblast from those settings,
+so the same pipeline runs from the dialog, from a batch job or from mayapy.
+'''
+import os
+import glob
+import json
+import shlex
+import shutil
+import contextlib
+import tempfile
+import time
+import platform
+import subprocess
+import multiprocessing
+
+import ANgularBrain as brain
+import ANgularWorker as worker
+import ANgularCache as cache
+import ANgularLayout as layout
+import ANgularTiming as timing
+import ANgularCompositor as compositor
+import cwd as getCurrentDirectory
+
+__TOOL_NAME__ = "ANgular"
+_FFMPEG_EXE_PATH_ = '{}/ffmpeg_exe/ffmpeg.exe'.format(getCurrentDirectory.getcwd())
+_PLATFORM_ = platform.system()
+_CAPABILITIES_ = {}
+_MIN_CHUNK_FRAMES_ = 50
+
+
+class PlayblastError(Exception):
+    '''
+    raised when a playblast cannot be taken, the message is meant for the artist
+    '''
+
+
+def get_ffmpeg_path():
+    '''
+    gets the ffmpeg executable, the ANGULAR_FFMPEG environment variable
+    overrides the one shipped in the ANgular directory
+    '''
+    return os.environ.get('ANGULAR_FFMPEG') or _FFMPEG_EXE_PATH_
+
+
+def get_settings_dir():
+    '''
+    gets the directory holding the tool settings, made if missing
+    '''
+    home_dir = os.path.expanduser("~")
+    playblast_dir = "{}/playblast".format(home_dir)
+    if not os.path.exists(playblast_dir):
+        os.makedirs(playblast_dir)
+    return playblast_dir
+
+
+def get_run_log_dir():
+    '''
+    gets the directory holding the json run logs of the playblasts
+    '''
+    return "{}/run_logs".format(get_settings_dir())
+
+
+def get_scratch_root(scratch_dir=''):
+    '''
+    gets the local directory the intermediates of the playblasts are written
+    to, the given one, else the ANGULAR_SCRATCH environment variable, else the
+    temporary directory of the system
+    '''
+    return scratch_dir or os.environ.get('ANGULAR_SCRATCH') or os.path.join(tempfile.gettempdir(), '{}_scratch'.format(__TOOL_NAME__))
+
+
+def get_free_bytes(directory):
+    '''
+    gets the free space of the disk holding the directory, None if unknown
+    '''
+    if hasattr(shutil, 'disk_usage'):
+        return shutil.disk_usage(directory).free
+    if hasattr(os, 'statvfs'):
+        stats = os.statvfs(directory)
+        return stats.f_bavail * stats.f_frsize
+    return None
+
+
+def get_capabilities_key():
+    '''
+    gets the key the playblast capabilities are cached under, as they only
+    change with the maya version and the platform
+    '''
+    return '{} {}'.format(brain.PlayblastFuncs.get_maya_version(), _PLATFORM_)
+
+
+def load_capabilities():
+    '''
+    gets the cached {"formats": [...], "codecs": {format: [...]}} capabilities
+    of this maya version and platform, read from disk once per session
+    '''
+    capabilities_key = get_capabilities_key()
+    if capabilities_key not in _CAPABILITIES_:
+        capabilities_path = "{}/capabilities.json".format(get_settings_dir())
+        all_capabilities = {}
+        if os.path.exists(capabilities_path):
+            try:
+                with open(capabilities_path, 'r') as reader:
+                    all_capabilities = json.load(reader)
+            except ValueError:
+                all_capabilities = {}
+        _CAPABILITIES_[capabilities_key] = all_capabilities.get(capabilities_key, {})
+    return _CAPABILITIES_[capabilities_key]
+
+
+def save_capabilities():
+    '''
+    writes the capabilities probed in this session to disk, next to the ones
+    of the other maya versions and platforms
+    '''
+    capabilities_path = "{}/capabilities.json".format(get_settings_dir())
+    all_capabilities = {}
+    if os.path.exists(capabilities_path):
+        try:
+            with open(capabilities_path, 'r') as reader:
+                all_capabilities = json.load(reader)
+        except ValueError:
+            all_capabilities = {}
+    all_capabilities.update(_CAPABILITIES_)
+    with open(capabilities_path, 'w') as writer:
+        json.dump(all_capabilities, writer, indent=4)
+
+
+def get_playblast_formats(refresh=False):
+    '''
+    gets the playblast formats, probed from maya only once per maya version
+    and platform unless refresh is asked for
+    '''
+    capabilities = load_capabilities()
+    if refresh or 'formats' not in capabilities:
+        capabilities['formats'] = [str(i) for i in brain.PlayblastFuncs.get_playblast_formats()]
+        save_capabilities()
+    return capabilities['formats']
+
+
+def get_codecs(in_format, refresh=False):
+    '''
+    gets the codecs of the playblast format, probed from maya only once per
+    maya version and platform unless refresh is asked for
+    '''
+    codecs = load_capabilities().setdefault('codecs', {})
+    if refresh or in_format not in codecs:
+        codecs[in_format] = [str(i) for i in brain.PlayblastFuncs.get_codecs(in_format)]
+        save_capabilities()
+    return codecs[in_format]
+
+
+def clear_capabilities():
+    '''
+    forgets the probed capabilities of this maya version and platform
+    '''
+    load_capabilities().clear()
+    save_capabilities()
+
+
+def get_file_safe_name(name):
+    '''
+    gets a node name usable in file names, namespaces and dag paths flattened
+    '''
+    return name.replace(':', '_').replace('|', '_')
+
+
+def renumber_image_sequence(path_pattern, frames, start_number):
+    '''
+    renames the given frames of a %4d image sequence to numbers following one
+    another from start_number, as ffmpeg reads image sequences without gaps
+    '''
+    for index, frame in enumerate(sorted(frames)):
+        if frame != start_number + index:
+            os.rename(path_pattern.replace('%4d', '{:04d}'.format(frame)), path_pattern.replace('%4d', '{:04d}'.format(start_number + index)))
+
+
+def get_capture_cache(cache_size):
+    '''
+    gets the capture cache of the settings directory holding at most
+    cache_size gigabytes
+    '''
+    return cache.CaptureCache("{}/capture_cache".format(get_settings_dir()), cache_size * 1024 ** 3)
+
+
+class PlayblastSettings(object):
+    '''
+    settings of a playblast, built from the dialog widgets or a batch manifest
+    '''
+    defaults = {
+        'output_dir': '',
+        'scratch_dir': '',
+        'scene_name': 'output',
+        'cameras': [],
+        'start_frame': 1,
+        'end_frame': 1,
+        'frame_step': 1,
+        'resolution': '1920x1080',
+        'layout': 'Auto',
+        'capture_at_tile_size': True,
+        'quality': 100,
+        'format': 'qt',
+        'codec': 'H.264',
+        'intermediate': 'Display Settings',
+        'encoder_profile': 'Auto',
+        'encoder_threads': 0,
+        'parallel_encodes': 1,
+        'deliverables': [],
+        'native_compositor': True,
+        'include_audio': True,
+        'view_polygons': False,
+        'capture_profile': 'As Viewport',
+        'capture_mode': 'Sequential',
+        'workers': 4,
+        'use_cache': False,
+        'cache_size': 20,
+        'profile_frames': False,
+    }
+
+    def __init__(self, **kwargs):
+        for key, value in self.defaults.items():
+            setattr(self, key, kwargs.get(key, value))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**dict((key, value) for key, value in data.items() if key in cls.defaults))
+
+    def to_dict(self):
+        return dict((key, getattr(self, key)) for key in self.defaults)
+
+    @property
+    def width(self):
+        return int(self.resolution.split('x')[0])
+
+    @property
+    def height(self):
+        return int(self.resolution.split('x')[1])
+
+    @property
+    def frame_count(self):
+        '''
+        number of frames captured, every frame_step frame of the frame range
+        '''
+        return max(0, (int(self.end_frame) - int(self.start_frame)) // int(self.frame_step) + 1)
+
+    @property
+    def capture_frames(self):
+        return list(range(int(self.start_frame), int(self.end_frame) + 1, int(self.frame_step)))
+
+    @property
+    def extension(self):
+        '''
+        extension of the final playblast
+        '''
+        return brain.PlayblastFuncs.get_video_extension(self.format) or ''
+
+    @property
+    def capture_format(self):
+        '''
+        playblast format of the camera captures, image sequences for the
+        Uncompressed intermediate whatever the format of the final playblast
+        '''
+        return 'image' if self.intermediate == 'Uncompressed' else self.format
+
+    @property
+    def capture_codec(self):
+        return 'bmp' if self.intermediate == 'Uncompressed' else self.codec
+
+    @property
+    def compression(self):
+        '''
+        image format of the cameras captured as image sequences
+        '''
+        return self.capture_codec if self.capture_format in ('image',) else 'jpg'
+
+    @property
+    def final_playblast_path(self):
+        return "{}/{}.{}".format(self.output_dir, self.scene_name, self.extension)
+
+    def get_draft_settings(self, frame_step=4):
+        '''
+        gets the settings of a cheap draft of this playblast, captured in the
+        session at half the resolution every frame_step frame, with the Fast
+        capture profile and the Draft encoder profile, and written next to it
+        with a _draft suffix
+        '''
+        draft = PlayblastSettings.from_dict(self.to_dict())
+        draft.scene_name = '{}_draft'.format(self.scene_name)
+        draft.resolution = '{}x{}'.format(layout.get_even(self.width // 2), layout.get_even(self.height // 2))
+        draft.frame_step = max(1, int(frame_step))
+        draft.quality = min(int(self.quality), 50)
+        draft.intermediate = 'Uncompressed'
+        draft.encoder_profile = 'Draft'
+        draft.parallel_encodes = 1
+        draft.deliverables = []
+        draft.use_cache = False
+        if self.capture_profile == 'As Viewport':
+            draft.capture_profile = 'Fast'
+        if self.capture_mode != 'Streaming':
+            draft.capture_mode = 'Multi-view'
+        return draft
+
+    def validate(self):
+        '''
+        raises a PlayblastError if the settings cannot make a playblast
+        '''
+        if not self.output_dir:
+            raise PlayblastError('File Path is empty.\nPlease give a file path')
+        if not self.cameras:
+            raise PlayblastError('Please select atleast 1 camera')
+        if self.frame_count < 1:
+            raise PlayblastError('The end frame is before the start frame')
+        if int(self.frame_step) > 1 and self.capture_mode in ('Parallel', 'Headless'):
+            raise PlayblastError('{} captures cannot skip frames, please capture every frame'.format(self.capture_mode))
+        if self.capture_mode in ('Parallel', 'Headless'):
+            if self.view_polygons or self.capture_profile != 'As Viewport':
+                raise PlayblastError('{} captures render the scene as saved, please capture As Viewport without View Polygons'.format(self.capture_mode))
+            if int(self.quality) < 100:
+                raise PlayblastError('{} captures are rendered at full quality, please set the quality to 100'.format(self.capture_mode))
+        if int(self.frame_step) > 1 and self.capture_mode == 'Sequential' and self.capture_format not in ('image',):
+            raise PlayblastError('Skipping frames needs image captures, please pick the Uncompressed intermediate')
+        for name in self.deliverables:
+            if not brain.PlayblastFuncs.get_deliverable(name):
+                raise PlayblastError('Unknown deliverable {}'.format(name))
+        if self.deliverables and self.capture_mode == 'Streaming':
+            raise PlayblastError('Streaming captures cannot make deliverables, please pick another capture mode')
+
+
+class Playblaster(object):
+    '''
+    captures the cameras of the settings and compiles them with ffmpeg
+    '''
+    process_class = subprocess.Popen
+
+    def __init__(self, settings, ffmpeg_path=None):
+        self.settings = settings
+        self.base_command = '"{}"'.format(ffmpeg_path or get_ffmpeg_path())
+        self.run_log = timing.RunLog(settings.to_dict())
+        self.ffmpeg_speed = None
+        self.scratch_dir = None
+        self.frame_profile = timing.FrameProfile() if settings.profile_frames else None
+
+    def run(self):
+        '''
+        takes the whole playblast without any UI, capture, compile and cleanup,
+        and gives back the final playblast path
+        '''
+        self.settings.validate()
+        final_playblast_path = self.settings.final_playblast_path
+        try:
+            if self.settings.capture_mode == 'Streaming':
+                self.stream_playblast(final_playblast_path)
+            else:
+                all_playblasts, temporary_playblasts = self.capture()
+                try:
+                    self.compile_playblasts(final_playblast_path, all_playblasts)
+                finally:
+                    self.cleanup(temporary_playblasts)
+        except Exception as e:
+            self.write_run_log('failed', str(e))
+            raise
+        self.write_run_log()
+        return final_playblast_path
+
+    def write_run_log(self, status='done', error=''):
+        '''
+        ends the run log and writes it to the run log directory, gives back
+        its path
+        '''
+        self.run_log.finish(status, error)
+        try:
+            return self.run_log.write(get_run_log_dir())
+        except (IOError, OSError) as e:
+            brain.PlayblastFuncs.display_warning("Cannot write the run log: {}".format(e))
+
+    def capture(self):
+        '''
+        captures every camera with the capture mode of the settings and gives
+        back all the camera playblasts and the temporary ones among them
+        '''
+        settings = self.settings
+        capture_mode = settings.capture_mode
+        if capture_mode != 'Sequential' or not settings.use_cache or int(settings.frame_step) > 1:
+            self.check_scratch_space()
+        with self.run_log.stage('capture', mode=capture_mode, frames=settings.frame_count * len(settings.cameras)) as stage:
+            if capture_mode == 'Multi-view':
+                all_playblasts = temporary_playblasts = self.capture_multi_view()
+            elif capture_mode == 'Parallel':
+                all_playblasts = temporary_playblasts = self.capture_parallel()
+            elif capture_mode == 'Headless':
+                all_playblasts = temporary_playblasts = self.capture_headless()
+            else:
+                all_playblasts, temporary_playblasts = self.capture_sequential()
+            stage['bytes_written'] = sum(timing.get_size(i) for i in temporary_playblasts)
+        self.record_frame_profile()
+        return all_playblasts, temporary_playblasts
+
+    def record_frame_profile(self):
+        '''
+        adds the report of the frame profile, if any, to the run log
+        '''
+        if self.frame_profile:
+            self.run_log.record['frame_profile'] = self.frame_profile.get_report()
+
+    def get_scratch_dir(self):
+        '''
+        gets the scratch directory of this run, made in the scratch root on the
+        first call and removed as a whole by cleanup
+        '''
+        if not self.scratch_dir:
+            scratch_root = get_scratch_root(self.settings.scratch_dir)
+            if not os.path.exists(scratch_root):
+                os.makedirs(scratch_root)
+            self.scratch_dir = tempfile.mkdtemp(prefix='{}_'.format(self.settings.scene_name), dir=scratch_root).replace('\\', '/')
+        return self.scratch_dir
+
+    def remove_scratch_dir(self):
+        if self.scratch_dir:
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
+            self.scratch_dir = None
+
+    def get_capture_bytes(self):
+        '''
+        gets a rough size of the camera captures, uncompressed bitmaps take 3
+        bytes a pixel and compressed captures are counted at a tenth of that
+        '''
+        settings = self.settings
+        bytes_per_pixel = 3.0 if settings.capture_format in ('image',) and settings.compression in ('bmp', 'tga', 'tiff', 'tif', 'iff') else 0.3
+        pixels = sum(width * height for width, height in self.get_capture_sizes())
+        return int(pixels * bytes_per_pixel * settings.frame_count)
+
+    def check_scratch_space(self):
+        '''
+        raises a PlayblastError if the scratch directory cannot hold the captures
+        '''
+        free_bytes = get_free_bytes(self.get_scratch_dir())
+        needed_bytes = self.get_capture_bytes()
+        if free_bytes is not None and free_bytes < needed_bytes * 1.1:
+            self.remove_scratch_dir()
+            raise PlayblastError('The captures need about {:.1f} GB but only {:.1f} GB are free in the scratch directory\n{}\nPlease free some space or pick another scratch path'.format(
+                needed_bytes / 1024.0 ** 3, free_bytes / 1024.0 ** 3, get_scratch_root(self.settings.scratch_dir)))
+
+    def get_capture_sizes(self, uniform=False):
+        '''
+        gets the (width, height) every camera is captured at, its tile in the
+        final playblast when capturing at tile size, the resolution otherwise.
+        uniform gives every camera the size of the biggest tile.
+        '''
+        settings = self.settings
+        if not settings.capture_at_tile_size:
+            return [(settings.width, settings.height)] * len(settings.cameras)
+        composite_size, tiles = layout.plan_layout(settings.layout, len(settings.cameras), settings.width, settings.height)
+        capture_sizes = [(tile[2], tile[3]) for tile in tiles]
+        if uniform:
+            capture_sizes = [max(capture_sizes)] * len(capture_sizes)
+        return capture_sizes
+
+    def get_camera_playblast_path(self, cam):
+        '''
+        gets the playblast path of a camera in the scratch directory, without
+        extension for image playblasts
+        '''
+        if self.settings.capture_format in ('image',):
+            return "{}/{}_{}".format(self.get_scratch_dir(), self.settings.scene_name, get_file_safe_name(cam))
+        extension = brain.PlayblastFuncs.get_video_extension(self.settings.capture_format) or ''
+        return "{}/{}_{}.{}".format(self.get_scratch_dir(), self.settings.scene_name, get_file_safe_name(cam), extension)
+
+    def get_image_sequence_template(self, cam):
+        '''
+        gets the %04d image sequence path of a camera in the scratch directory
+        '''
+        return "{}/{}_{}.%04d.{}".format(self.get_scratch_dir(), self.settings.scene_name, get_file_safe_name(cam), self.settings.compression)
+
+    def capture_sequential(self):
+        '''
+        playblasts the cameras one after another, reusing the cached frames of
+        the capture cache if asked for, or a frame at a time when profiling
+        '''
+        settings = self.settings
+        all_playblasts = []
+        temporary_playblasts = []
+        cache_keys = []
+        use_cache = settings.use_cache and int(settings.frame_step) == 1
+        if use_cache:
+            capture_cache = get_capture_cache(settings.cache_size)
+            scene_state = brain.PlayblastFuncs.get_scene_state(settings.cameras)
+
+        with self.capture_profile():
+            for cam, (width, height) in zip(settings.cameras, self.get_capture_sizes()):
+                if use_cache:
+                    camera_state = cache.get_camera_state(scene_state, cam)
+                    cache_key = cache.make_key(cam, brain.PlayblastFuncs.get_camera_attributes(cam), scene_state['cameras'][cam]['static'], str(width), str(height), int(settings.quality), settings.compression, settings.view_polygons, settings.capture_profile)
+                    frames_to_capture = capture_cache.get_frames_to_capture(cache_key, settings.compression, camera_state, settings.start_frame, settings.end_frame)
+                    if frames_to_capture:
+                        with self.run_log.stage('look_through', camera=cam):
+                            brain.PlayblastFuncs.look_through(cam)
+                        with self.run_log.stage('playblast', camera=cam, frames=len(frames_to_capture)):
+                            brain.PlayblastFuncs.playblast(f=capture_cache.get_capture_path(cache_key),
+                                        frame=frames_to_capture,
+                                        qlt=int(settings.quality),
+                                        fmt='image',
+                                        c=settings.compression,
+                                        fo=1,
+                                        v=0,
+                                        os=1,
+                                        p=100,
+                                        w=width,
+                                        h=height)
+                    capture_cache.commit(cache_key, camera_state)
+                    cache_keys.append(cache_key)
+                    image_path_template = self.get_image_sequence_template(cam)
+                    with self.run_log.stage('link_cache', camera=cam, frames=settings.frame_count):
+                        capture_cache.link_frames(cache_key, settings.compression, settings.start_frame, settings.end_frame, image_path_template)
+                    output = image_path_template.replace('%04d', '%4d')
+                    all_playblasts.append(output)
+                    temporary_playblasts.append(output)
+                    continue
+
+                with self.run_log.stage('look_through', camera=cam):
+                    brain.PlayblastFuncs.look_through(cam)
+                if self.frame_profile:
+                    with self.run_log.stage('playblast', camera=cam, frames=settings.frame_count):
+                        output = self.capture_profiled_frames(cam, width, height)
+                    all_playblasts.append(output)
+                    temporary_playblasts.append(output)
+                    continue
+                with self.run_log.stage('playblast', camera=cam, frames=settings.frame_count):
+                    output = brain.PlayblastFuncs.playblast(f=self.get_camera_playblast_path(cam),
+                                frame=settings.capture_frames,
+                                qlt=int(settings.quality),
+                                fmt=settings.capture_format,
+                                c=settings.capture_codec,
+                                fo=1,
+                                v=0,
+                                os=1,
+                                p=100,
+                                w=width,
+                                h=height)
+
+                if '.####.' in output:
+                    output = output.replace('.####.', '.%4d.')
+                    if int(settings.frame_step) > 1:
+                        renumber_image_sequence(output, settings.capture_frames, settings.start_frame)
+                all_playblasts.append(output)
+                temporary_playblasts.append(output)
+
+        if cache_keys:
+            capture_cache.evict(keep_keys=cache_keys)
+        return all_playblasts, temporary_playblasts
+
+    def capture_profiled_frames(self, cam, width, height):
+        '''
+        captures the camera a frame at a time as an image sequence, timing the
+        scene evaluation and the viewport readback of every frame
+        '''
+        settings = self.settings
+        image_path_template = self.get_image_sequence_template(cam)
+        current_time = brain.PlayblastFuncs.get_current_time()
+        try:
+            for index, frame in enumerate(settings.capture_frames):
+                start_time = time.time()
+                brain.PlayblastFuncs.set_current_time(frame)
+                evaluated_time = time.time()
+                brain.PlayblastFuncs.capture_frame(frame, image_path_template % (settings.start_frame + index), width, height, int(settings.quality), settings.compression)
+                self.frame_profile.add(frame, cam, evaluated_time - start_time, time.time() - evaluated_time)
+        finally:
+            brain.PlayblastFuncs.set_current_time(current_time)
+        return image_path_template.replace('%04d', '%4d')
+
+    def capture_multi_view(self):
+        '''
+        captures every camera at each frame while stepping the timeline once
+        '''
+        settings = self.settings
+        image_path_template = "{}/{}_{{camera}}.{{frame:04d}}.{}".format(self.get_scratch_dir(), settings.scene_name, settings.compression)
+        for cam, image_path in self.iter_multi_view_frames(image_path_template, settings.compression):
+            pass
+        return [image_path_template.replace('{frame:04d}', '%4d').format(camera=get_file_safe_name(cam)) for cam in settings.cameras]
+
+    def capture_parallel(self):
+        '''
+        saves a snapshot of the scene and captures it in headless mayapy workers,
+        one per camera and frame range chunk
+        '''
+        settings = self.settings
+        max_workers = int(settings.workers)
+        snapshot_path = '{}/{}_snapshot.ma'.format(self.get_scratch_dir(), settings.scene_name)
+        brain.PlayblastFuncs.save_scene_snapshot(snapshot_path)
+
+        mayapy = worker.get_mayapy_path()
+        chunks = worker.split_frame_range(settings.start_frame, settings.end_frame, max(1, max_workers // len(settings.cameras)))
+        worker_commands = []
+        all_playblasts = []
+        for cam, (width, height) in zip(settings.cameras, self.get_capture_sizes()):
+            image_path_template = self.get_image_sequence_template(cam)
+            all_playblasts.append(image_path_template.replace('%04d', '%4d'))
+            for chunk_start, chunk_end in chunks:
+                worker_commands.append(worker.build_worker_command(mayapy, snapshot_path, cam, chunk_start, chunk_end, width, height, image_path_template, settings.compression))
+        return_codes = worker.run_workers(worker_commands, max_workers)
+        self.remove_file(snapshot_path)
+
+        if any(return_codes):
+            self.cleanup(all_playblasts)
+            raise PlayblastError('{} of {} capture workers failed using\n{}'.format(len([code for code in return_codes if code]), len(return_codes), mayapy))
+        return all_playblasts
+
+    def capture_headless(self):
+        '''
+        renders every camera with the Viewport 2.0 batch renderer, for mayapy
+        sessions where playblast is not available
+        '''
+        settings = self.settings
+        all_playblasts = []
+        for cam, (width, height) in zip(settings.cameras, self.get_capture_sizes()):
+            image_path_template = self.get_image_sequence_template(cam)
+            worker.render_frames(cam, settings.start_frame, settings.end_frame, width, height, image_path_template, settings.compression)
+            all_playblasts.append(image_path_template.replace('%04d', '%4d'))
+        return all_playblasts
+
+    @contextlib.contextmanager
+    def capture_profile(self, panels=None):
+        '''
+        applies the capture profile of the settings, and view polygons if
+        asked for, to the given model panels, or to the panel playblast captures
+        from, for the time of the with block
+        '''
+        settings = self.settings
+        profile_state = brain.PlayblastFuncs.apply_capture_profile(settings.capture_profile, settings.view_polygons, panels)
+        try:
+            yield
+        finally:
+            brain.PlayblastFuncs.restore_capture_profile(profile_state)
+
+    def iter_multi_view_frames(self, image_path_template, compression='bmp', uniform=False):
+        '''
+        steps the timeline once and captures every camera from its own offscreen
+        model panel at each frame, so the scene is evaluated once per frame
+        whatever the number of cameras. Yields the camera and its captured image
+        path formatted from image_path_template with camera and frame keys, the
+        frames of a frame step being numbered one after another.
+        '''
+        settings = self.settings
+        capture_sizes = dict(zip(settings.cameras, self.get_capture_sizes(uniform)))
+        window, panels = brain.PlayblastFuncs.create_capture_panels(settings.cameras, settings.width, settings.height)
+        current_time = brain.PlayblastFuncs.get_current_time()
+        try:
+            with self.capture_profile(list(panels.values())):
+                for index, frame in enumerate(settings.capture_frames):
+                    start_time = time.time()
+                    brain.PlayblastFuncs.set_current_time(frame)
+                    if self.frame_profile:
+                        self.frame_profile.add(frame, evaluation=time.time() - start_time)
+                    for cam in settings.cameras:
+                        image_path = image_path_template.format(camera=get_file_safe_name(cam), frame=settings.start_frame + index)
+                        width, height = capture_sizes[cam]
+                        start_time = time.time()
+                        brain.PlayblastFuncs.capture_frame(frame, image_path, width, height, int(settings.quality), compression, panels[cam])
+                        if self.frame_profile:
+                            self.frame_profile.add(frame, cam, readback=time.time() - start_time)
+                        yield cam, image_path
+        finally:
+            brain.PlayblastFuncs.set_current_time(current_time)
+            brain.PlayblastFuncs.delete_capture_panels(window, panels)
+
+    def stream_playblast(self, final_playblast_path):
+        '''
+        captures every frame of all the cameras and streams it straight into one
+        ffmpeg process building the final playblast, so no per camera playblasts
+        are written. The frames are interleaved camera by camera in a single
+        image pipe and split back per camera inside the filter graph.
+        '''
+        camera_count = len(self.settings.cameras)
+        capture_sizes = self.get_capture_sizes(uniform=True)
+        fps = brain.PlayblastFuncs.get_fps()
+        audio_file = brain.PlayblastFuncs.get_audio(self.settings.include_audio)
+
+        stream_command = '{} -loglevel error -f image2pipe -framerate {} -c:v bmp -i - '.format(self.base_command, self.get_capture_fps() * camera_count)
+        if audio_file:
+            stream_command += '-i "{}" '.format(audio_file)
+        if camera_count > 1:
+            stream_command += '-filter_complex "[0:v]split={}{};'.format(camera_count, ''.join('[c{}]'.format(index) for index in range(camera_count)))
+            for index in range(camera_count):
+                stream_command += '[c{0}]select=eq(mod(n\\,{1})\\,{0}),setpts=PTS-STARTPTS[s{0}];'.format(index, camera_count)
+            stream_command += '{}" -map "[v]" '.format(self.get_stack_filter(['s{}'.format(index) for index in range(camera_count)], input_sizes=capture_sizes))
+        else:
+            stream_command += '-filter_complex "{}" -map "[v]" '.format(self.get_stack_filter(['0:v'], input_sizes=capture_sizes))
+        stream_command += '-r {} -c:v libx264 {}'.format(fps, self.get_encoder_options())
+        if audio_file:
+            stream_command += '-map 1:a -c:a aac -af apad -shortest '
+        stream_command += '-y "{}"'.format(final_playblast_path)
+
+        try:
+            process = self.open_ffmpeg_process(stream_command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except Exception as e:
+            raise PlayblastError('Following error occurred while compiling video \n{}'.format(e))
+        scratch_image = '{}/stream.bmp'.format(self.get_scratch_dir())
+        captured_frames = self.iter_multi_view_frames(scratch_image, uniform=True)
+        with self.run_log.stage('stream', frames=self.settings.frame_count * camera_count, bytes_read=0) as stage:
+            try:
+                for cam, image_path in captured_frames:
+                    with open(image_path, 'rb') as reader:
+                        image_data = reader.read()
+                    stage['bytes_read'] += len(image_data)
+                    try:
+                        process.stdin.write(image_data)
+                    except (IOError, OSError) as e:
+                        brain.PlayblastFuncs.display_warning("ffmpeg stopped reading the captured frames: {}".format(e))
+                        break
+            except Exception:
+                self.kill_stream(process, final_playblast_path)
+                raise
+            finally:
+                captured_frames.close()
+            stdout, stderr = process.communicate()
+            stage['bytes_written'] = timing.get_size(final_playblast_path)
+        self.remove_scratch_dir()
+        self.record_frame_profile()
+
+        if process.returncode != 0:
+            raise PlayblastError('Following error occurred while compiling video \n{}'.format(stderr.decode('utf-8', 'replace')))
+        return final_playblast_path
+
+    def kill_stream(self, process, final_playblast_path):
+        '''
+        stops the ffmpeg process of a failed stream and removes the scratch
+        directory and the partial playblast
+        '''
+        process.kill()
+        process.communicate()
+        self.remove_scratch_dir()
+        if os.path.exists(final_playblast_path):
+            self.remove_file(final_playblast_path)
+
+    def compile_playblasts(self, final_playblast_path, all_playblasts_list):
+        '''
+        compiles all the playblasts and the scene audio into the final playblast
+        with a single ffmpeg pass, or with frame range chunks encoded in parallel
+        and joined with a stream copy, stream copying the video wherever possible
+        '''
+        with self.run_log.stage('compile', frames=self.settings.frame_count) as stage:
+            stage['bytes_read'] = sum(timing.get_size(i) for i in all_playblasts_list)
+            for compile_commands in self.get_compile_commands(final_playblast_path, all_playblasts_list):
+                if len(compile_commands) > 1:
+                    self.run_ffmpeg_commands(compile_commands)
+                    stage['speed'] = self.ffmpeg_speed
+                else:
+                    self.run_ffmpeg_command(compile_commands[0])
+                    stage.setdefault('speed', self.ffmpeg_speed)
+            stage['bytes_written'] = timing.get_size(final_playblast_path)
+        return all_playblasts_list
+
+    def get_compile_commands(self, final_playblast_path, all_playblasts_list):
+        '''
+        gets the steps compiling the final playblast, each step being a list of
+        ffmpeg commands to run at once. With parallel encodes the frame range
+        chunks are encoded in a first step and joined in a second one.
+        '''
+        chunks = self.get_encode_chunks()
+        if not chunks and self.can_composite_natively(all_playblasts_list):
+            return [[self.get_compositor_command(final_playblast_path, all_playblasts_list)]]
+        if not chunks or (len(all_playblasts_list) == 1 and '%4d' not in all_playblasts_list[0]):
+            return [[self.get_compile_command(final_playblast_path, all_playblasts_list)]]
+
+        threads = self.settings.encoder_threads or max(1, multiprocessing.cpu_count() // len(chunks))
+        chunk_commands = []
+        chunk_paths = []
+        for index, (chunk_start, chunk_end) in enumerate(chunks):
+            chunk_path = '{}/chunk_{:03d}.{}'.format(self.get_scratch_dir(), index, self.settings.extension or 'mov')
+            chunk_commands.append(self.get_encode_command(chunk_path, all_playblasts_list, chunk_start, chunk_end - chunk_start + 1, threads=threads))
+            chunk_paths.append(chunk_path)
+        concat_list_path = '{}/chunks.txt'.format(self.get_scratch_dir())
+        with open(concat_list_path, 'w') as writer:
+            writer.write(''.join("file '{}'\n".format(i.replace("'", "'\\''")) for i in chunk_paths))
+        return [chunk_commands, [self.get_concat_command(concat_list_path, final_playblast_path)]]
+
+    def can_composite_natively(self, all_playblasts_list):
+        '''
+        tells if the native compositor can lay the playblasts out, which needs
+        numpy, bmp image sequences captured at their tile size and no
+        deliverables
+        '''
+        settings = self.settings
+        if not settings.native_compositor or not compositor.is_available() or settings.deliverables:
+            return False
+        if not all_playblasts_list or not all('%4d' in i and i.lower().endswith('.bmp') for i in all_playblasts_list):
+            return False
+        composite_size, tiles = layout.plan_layout(settings.layout, len(all_playblasts_list), settings.width, settings.height)
+        return [(tile[2], tile[3]) for tile in tiles] == [tuple(size) for size in self.get_capture_sizes()]
+
+    def get_compositor_command(self, final_playblast_path, all_playblasts_list):
+        '''
+        gets the command laying the bmp playblasts out with the native
+        compositor and piping them to ffmpeg, its job being written to the
+        scratch directory
+        '''
+        settings = self.settings
+        composite_size, tiles = layout.plan_layout(settings.layout, len(all_playblasts_list), settings.width, settings.height)
+        audio_file = brain.PlayblastFuncs.get_audio(settings.include_audio)
+        encode_options = '-f rawvideo -pix_fmt bgr24 -s {}x{} -framerate {:g} -i - '.format(composite_size[0], composite_size[1], self.get_capture_fps())
+        if audio_file:
+            encode_options += '-i "{}" '.format(audio_file)
+        encode_options += '-vf format=yuv420p -map 0:v -c:v libx264 {}-frames:v {} '.format(self.get_encoder_options(), settings.frame_count)
+        if audio_file:
+            encode_options += '-map 1:a -c:a aac -af apad -shortest '
+        encode_options += '-y "{}"'.format(final_playblast_path)
+
+        job = compositor.build_job(all_playblasts_list, tiles, composite_size, settings.start_frame, settings.frame_count,
+                                   0, self.base_command.strip('"'), encode_options)
+        job_path = '{}/composite.json'.format(self.get_scratch_dir())
+        with open(job_path, 'w') as writer:
+            json.dump(job, writer)
+        return compositor.build_compositor_command(compositor.get_python_path(), job_path)
+
+    def get_encode_chunks(self):
+        '''
+        gets the (start, end) frame range chunks encoded in parallel, none when
+        parallel encodes are off, the range is too short to gain from them or
+        deliverables are compiled along in a single pass
+        '''
+        settings = self.settings
+        chunk_count = min(int(settings.parallel_encodes), settings.frame_count // _MIN_CHUNK_FRAMES_)
+        if chunk_count < 2 or settings.deliverables:
+            return []
+        return worker.split_frame_range(settings.start_frame, settings.start_frame + settings.frame_count - 1, chunk_count)
+
+    def get_concat_command(self, concat_list_path, final_playblast_path):
+        '''
+        gets the ffmpeg command joining the encoded chunks of the concat list
+        without encoding them again, adding the scene audio
+        '''
+        audio_file = brain.PlayblastFuncs.get_audio(self.settings.include_audio)
+        concat_command = '{} -f concat -safe 0 -i "{}" '.format(self.base_command, concat_list_path)
+        if audio_file:
+            concat_command += '-i "{}" -map 0:v -map 1:a -c:a aac -af apad -shortest '.format(audio_file)
+        return concat_command + '-c:v copy -y "{}"'.format(final_playblast_path)
+
+    def get_compile_command(self, final_playblast_path, all_playblasts_list):
+        '''
+        gets the ffmpeg command compiling all the playblasts and the scene audio
+        into the final playblast and its deliverables. A single movie playblast
+        without deliverables is remuxed as is, along with the audio if any.
+        '''
+        base_command = self.base_command
+        audio_file = brain.PlayblastFuncs.get_audio(self.settings.include_audio)
+        playblast_count = len(all_playblasts_list)
+        if playblast_count == 1 and '%4d' not in all_playblasts_list[0] and not self.settings.deliverables:
+            if audio_file:
+                return self.get_audio_command(audio_file, all_playblasts_list[0], final_playblast_path)
+            return '{} -i "{}" -map 0 -c copy -y "{}"'.format(base_command, all_playblasts_list[0], final_playblast_path)
+
+        return self.get_encode_command(final_playblast_path, all_playblasts_list, self.settings.start_frame, self.settings.frame_count, audio_file, deliverable_outputs=self.get_deliverable_outputs())
+
+    def get_encode_command(self, output_path, all_playblasts_list, start_frame, frame_count, audio_file=None, threads=None, deliverable_outputs=()):
+        '''
+        gets the ffmpeg command laying out and encoding frame_count frames of
+        all the playblasts from the start frame, movie playblasts being seeked
+        to it. The (deliverable, path, camera index) deliverable outputs are
+        split from the same filter graph, so every input is decoded once.
+        '''
+        base_command = self.base_command
+        playblast_count = len(all_playblasts_list)
+        seek_time = float(start_frame - self.settings.start_frame) / self.get_capture_fps()
+        for i in all_playblasts_list:
+            input_options = self.get_image_sequence_options(i, start_frame) or ('-ss {:.6f} '.format(seek_time) if seek_time else '')
+            base_command = '{0} {1}-i "{2}" '.format(base_command, input_options, i)
+        if audio_file:
+            base_command += '-i "{}" '.format(audio_file)
+
+        input_labels = ['{}:v'.format(index) for index in range(playblast_count)]
+        filter_parts = []
+        camera_labels = dict((index, []) for index in range(playblast_count))
+        composite_labels = []
+        for number, (deliverable, path, camera_index) in enumerate(deliverable_outputs):
+            if camera_index is None:
+                composite_labels.append('o{}'.format(number))
+            else:
+                camera_labels[camera_index].append('o{}'.format(number))
+        for index in range(playblast_count):
+            if camera_labels[index]:
+                filter_parts.append('[{}]split={}[i{}]{}'.format(input_labels[index], len(camera_labels[index]) + 1, index, ''.join('[{}_in]'.format(label) for label in camera_labels[index])))
+                input_labels[index] = 'i{}'.format(index)
+        if composite_labels:
+            filter_parts.append(self.get_stack_filter(input_labels, 'stack'))
+            filter_parts.append('[stack]split={}[v]{}'.format(len(composite_labels) + 1, ''.join('[{}_in]'.format(label) for label in composite_labels)))
+        else:
+            filter_parts.append(self.get_stack_filter(input_labels))
+        for number, (deliverable, path, camera_index) in enumerate(deliverable_outputs):
+            filter_parts.append('[o{0}_in]{1}[o{0}]'.format(number, self.get_deliverable_filter(deliverable, frame_count)))
+
+        base_command += '-filter_complex "{}" -map "[v]" '.format(';'.join(filter_parts))
+        base_command += '-c:v libx264 {}-frames:v {} '.format(self.get_encoder_options(threads), frame_count)
+        if audio_file:
+            base_command += '-map {}:a -c:a aac -af apad -shortest '.format(playblast_count)
+        base_command += '-y "{}"'.format(output_path)
+
+        for number, (deliverable, path, camera_index) in enumerate(deliverable_outputs):
+            base_command += ' -map "[o{}]" '.format(number)
+            if deliverable['kind'] == 'Contact Sheet':
+                base_command += '-frames:v 1 -update 1 -q:v 2 '
+            else:
+                base_command += '{}-frames:v {} '.format(self.get_deliverable_encoder_options(deliverable, threads), frame_count)
+                if audio_file:
+                    base_command += '-map {}:a -c:a aac -af apad -shortest '.format(playblast_count)
+            base_command += '-y "{}"'.format(path)
+        return base_command
+
+    def get_deliverable_outputs(self):
+        '''
+        gets the (deliverable, path, camera index) of every output of the
+        deliverables of the settings, written next to the final playblast.
+        The camera index is None for the outputs made from the composite.
+        '''
+        settings = self.settings
+        deliverable_outputs = []
+        for name in settings.deliverables:
+            deliverable = brain.PlayblastFuncs.get_deliverable(name)
+            extension = deliverable.get('extension') or settings.extension
+            if deliverable['kind'] == 'Cameras':
+                for index, cam in enumerate(settings.cameras):
+                    deliverable_outputs.append((deliverable, '{}/{}{}_{}.{}'.format(settings.output_dir, settings.scene_name, deliverable['suffix'], get_file_safe_name(cam), extension), index))
+            else:
+                deliverable_outputs.append((deliverable, '{}/{}{}.{}'.format(settings.output_dir, settings.scene_name, deliverable['suffix'], extension), None))
+        return deliverable_outputs
+
+    def get_output_paths(self):
+        '''
+        gets the final playblast path and the paths of its deliverables
+        '''
+        return [self.settings.final_playblast_path] + [path for deliverable, path, camera_index in self.get_deliverable_outputs()]
+
+    def get_deliverable_filter(self, deliverable, frame_count):
+        '''
+        gets the filters turning the composite or a camera capture into a
+        deliverable, a contact sheet picking columns x rows frames spread over
+        the frame count
+        '''
+        if deliverable['kind'] == 'Contact Sheet':
+            columns, rows = deliverable['columns'], deliverable['rows']
+            frame_step = max(1, frame_count // (columns * rows))
+            return 'select=not(mod(n\\,{0})),scale=trunc(iw/{1}/2)*2:-2,tile={1}x{2}'.format(frame_step, columns, rows)
+        scale = deliverable.get('scale', 1.0)
+        deliverable_filter = 'scale=trunc(iw*{0:g}/2)*2:trunc(ih*{0:g}/2)*2'.format(scale)
+        if deliverable.get('codec', 'libx264') == 'libx264':
+            deliverable_filter += ',format=yuv420p'
+        return deliverable_filter
+
+    def get_deliverable_encoder_options(self, deliverable, threads=None):
+        '''
+        gets the video codec options of a deliverable, the libx264 options of
+        its encoder profile or the codec options it gives
+        '''
+        codec = deliverable.get('codec', 'libx264')
+        if codec != 'libx264':
+            return '-c:v {} {}'.format(codec, deliverable.get('codec_options', ''))
+        settings = self.settings
+        encoder_options = brain.PlayblastFuncs.get_encoder_options(deliverable.get('encoder_profile', settings.encoder_profile), settings.quality, brain.PlayblastFuncs.get_fps(), threads or settings.encoder_threads)
+        return '-c:v libx264 {}'.format(encoder_options)
+
+    def get_encoder_options(self, threads=None):
+        '''
+        gets the libx264 options of the encoder profile of the settings, with
+        the encoder threads of the settings unless threads are given
+        '''
+        settings = self.settings
+        return brain.PlayblastFuncs.get_encoder_options(settings.encoder_profile, settings.quality, brain.PlayblastFuncs.get_fps(), threads or settings.encoder_threads)
+
+    def get_capture_fps(self):
+        '''
+        gets the frame rate the captured frames play at, every captured frame
+        lasting frame_step frames of the scene so the playblast keeps its timing
+        '''
+        return brain.PlayblastFuncs.get_fps() / float(self.settings.frame_step)
+
+    def get_image_sequence_options(self, playblast_path, start_frame):
+        '''
+        gets the ffmpeg input options reading an image sequence playblast at the
+        capture frame rate from the start frame, nothing for a movie playblast
+        '''
+        if '%4d' not in playblast_path:
+            return ''
+        return '-framerate {:g} -start_number {} '.format(self.get_capture_fps(), start_frame)
+
+    def get_stack_filter(self, input_labels, output_label='v', input_sizes=None):
+        '''
+        gets the filter graph laying out the given filter graph input labels with
+        the layout of the settings, the inputs being the camera captures unless
+        their (width, height) input_sizes are given
+        '''
+        settings = self.settings
+        composite_size, tiles = layout.plan_layout(settings.layout, len(input_labels), settings.width, settings.height)
+        if not input_sizes:
+            input_sizes = self.get_capture_sizes()
+        return layout.build_stack_filter(input_labels, input_sizes, tiles, output_label)
+
+    def add_audio_to_video(self, audio_path, video_path, output_path):
+        '''
+        adds the audio to given video by remuxing it, the video stream is copied as is
+        '''
+        with self.run_log.stage('add_audio', bytes_read=timing.get_size(video_path) + timing.get_size(audio_path)) as stage:
+            self.run_ffmpeg_command(self.get_audio_command(audio_path, video_path, output_path))
+            stage['speed'] = self.ffmpeg_speed
+            stage['bytes_written'] = timing.get_size(output_path)
+        return True
+
+    def get_audio_command(self, audio_path, video_path, output_path):
+        '''
+        gets the ffmpeg command remuxing the given video with the audio, padded
+        with silence so a short audio never cuts the video
+        '''
+        audio_base_command = self.base_command
+        return '{} -i "{}" -i "{}" -map 0:v -map 1:a -c:v copy -c:a aac -af apad -shortest -y "{}"'.format(audio_base_command, video_path, audio_path, output_path)
+
+    def cleanup(self, temporary_playblasts):
+        '''
+        removes the temporary camera playblasts, the ones in the scratch
+        directory go with it in one go
+        '''
+        with self.run_log.stage('cleanup', files=len(set(temporary_playblasts))):
+            for i in list(set(temporary_playblasts)):
+                if self.scratch_dir and i.startswith(self.scratch_dir):
+                    continue
+                if '%4d' in i:
+                    self.delete_image_sequences(i)
+                else:
+                    self.remove_file(i)
+            self.remove_scratch_dir()
+
+    def delete_image_sequences(self, image_playblast_path):
+        all_paths = glob.glob(image_playblast_path.replace('%4d', '*'))
+        for i in all_paths:
+            self.remove_file(i)
+
+    def remove_file(self, file_path):
+        try:
+            os.remove(file_path)
+        except Exception as e:
+            brain.PlayblastFuncs.display_warning("Cannot delete the {}".format(file_path))
+
+    def run_ffmpeg_commands(self, commands_to_run):
+        '''
+        runs the ffmpeg commands at once, their errors going to log files of the
+        scratch directory, raising a PlayblastError if any of them fails
+        '''
+        processes = []
+        try:
+            for index, command_to_run in enumerate(commands_to_run):
+                error_file = open('{}/ffmpeg_{:03d}.log'.format(self.get_scratch_dir(), index), 'w+')
+                processes.append((self.open_ffmpeg_process(command_to_run, stderr=error_file), error_file))
+        except Exception as e:
+            for process, error_file in processes:
+                process.kill()
+                error_file.close()
+            raise PlayblastError('Following error occurred while compiling video \n{}'.format(e))
+
+        errors = []
+        speeds = []
+        for process, error_file in processes:
+            process.wait()
+            error_file.seek(0)
+            error_text = error_file.read()
+            error_file.close()
+            if process.returncode != 0:
+                errors.append(error_text[-1000:])
+            speeds.append(timing.parse_ffmpeg_speed(error_text) or 0.0)
+        if errors:
+            raise PlayblastError('Following error occurred while compiling video \n{}'.format('\n'.join(errors)))
+        self.ffmpeg_speed = sum(speeds) or None
+        return True
+
+    def open_ffmpeg_process(self, command_to_run, **kwargs):
+        '''
+        starts the ffmpeg command headless and gives back its process
+        '''
+        if _PLATFORM_ == 'Windows':
+            si = subprocess.STARTUPINFO()
+            si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            return self.process_class(command_to_run, startupinfo= si, **kwargs)
+        env = {'PATH': '/usr/local/bin:/usr/bin:/bin'}
+        return self.process_class(shlex.split(command_to_run), env=env, **kwargs)
+
+    def run_ffmpeg_command(self, command_to_run):
+        '''
+        runs the ffmpeg compilation headless command, raising a PlayblastError
+        if it fails
+        '''
+        try:
+            process = self.open_ffmpeg_process(command_to_run, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            stdout, stderr = process.communicate()
+        except Exception as e:
+            raise PlayblastError('Following error occurred while compiling video \n{}'.format(e))
+        if process.returncode != 0:
+            raise PlayblastError('Following error occurred while compiling video \n{}'.format(stderr.decode('utf-8', 'replace')[-2000:]))
+        self.ffmpeg_speed = timing.parse_ffmpeg_speed(stderr.decode('utf-8', 'replace'))
+        return True
@@ -0,0 +1,203 @@
+'''
+non blocking ffmpeg processes for ANgular
+
+FFmpegProcess runs an ffmpeg command through a QProcess so the maya session
+stays responsive, and reports the -progress output of ffmpeg as it encodes.
+FFmpegBatch runs several of them, like the chunks of a parallel encode.
+'''
+import shlex
+import collections
+
+try:
+    from PySide2 import QtCore
+except ImportError:
+    from PySide import QtCore
+
+
+def split_command(command_to_run):
+    '''
+    splits an ffmpeg command string into its arguments, keeping windows paths
+    and filter graphs intact and dropping the double quotes around them
+    '''
+    arguments = []
+    for argument in shlex.split(command_to_run, posix=False):
+        if len(argument) > 1 and argument.startswith('"') and argument.endswith('"'):
+            argument = argument[1:-1]
+        arguments.append(argument)
+    return arguments
+
+
+def parse_progress_line(line, stats):
+    '''
+    updates the stats dictionary from a key=value line of ffmpeg -progress
+    output, gives back True once a whole progress block has been read
+    '''
+    if '=' not in line:
+        return False
+    key, value = [i.strip() for i in line.split('=', 1)]
+    if key == 'frame':
+        stats['frame'] = int(value) if value.isdigit() else 0
+    elif key == 'fps':
+        try:
+            stats['fps'] = float(value)
+        except ValueError:
+            stats['fps'] = 0.0
+    elif key == 'speed':
+        try:
+            stats['speed'] = float(value.rstrip('x'))
+        except ValueError:
+            stats['speed'] = 0.0
+    elif key == 'out_time':
+        stats['out_time'] = value
+    elif key == 'total_size':
+        stats['total_size'] = int(value) if value.isdigit() else 0
+    elif key == 'progress':
+        stats['progress'] = value
+        return True
+    return False
+
+
+class FFmpegProcess(QtCore.QObject):
+    '''
+    runs an ffmpeg command in the background and emits its encoding progress,
+    progress carries frame, fps, speed, out_time and percent of total_frames
+    '''
+    progress = QtCore.Signal(dict)
+    finished = QtCore.Signal(bool, str)
+
+    def __init__(self, command_to_run, total_frames=0, parent=None):
+        super(FFmpegProcess, self).__init__(parent)
+        self.command_to_run = command_to_run
+        self.total_frames = total_frames
+        self.stats = {}
+        self.cancelled = False
+        self._stdout_buffer = ''
+        self._stderr_lines = collections.deque(maxlen=50)
+        self.process = QtCore.QProcess(self)
+        self.process.readyReadStandardOutput.connect(self._read_progress)
+        self.process.readyReadStandardError.connect(self._read_errors)
+        self.process.finished.connect(self._on_finished)
+        if hasattr(self.process, 'errorOccurred'):
+            self.process.errorOccurred.connect(self._on_error)
+        else:
+            self.process.error.connect(self._on_error)
+
+    def start(self):
+        '''
+        starts ffmpeg asking it to write its progress to stdout, a python
+        script piping into ffmpeg getting the progress options after the script
+        '''
+        arguments = split_command(self.command_to_run)
+        option_index = 2 if len(arguments) > 1 and arguments[1].endswith('.py') else 1
+        self.process.start(arguments[0], arguments[1:option_index] + ['-progress', 'pipe:1', '-nostats'] + arguments[option_index:])
+
+    def cancel(self):
+        '''
+        stops the running ffmpeg process
+        '''
+        self.cancelled = True
+        self.process.kill()
+
+    def is_running(self):
+        return self.process.state() != QtCore.QProcess.NotRunning
+
+    def _read_progress(self):
+        self._stdout_buffer += bytes(self.process.readAllStandardOutput()).decode('utf-8', 'replace')
+        lines = self._stdout_buffer.split('\n')
+        self._stdout_buffer = lines.pop()
+        for line in lines:
+            if parse_progress_line(line, self.stats):
+                stats = dict(self.stats)
+                if self.total_frames:
+                    stats['percent'] = min(100, int(100 * stats.get('frame', 0) / float(self.total_frames)))
+                self.progress.emit(stats)
+
+    def _read_errors(self):
+        error_text = bytes(self.process.readAllStandardError()).decode('utf-8', 'replace')
+        self._stderr_lines.extend(error_text.splitlines())
+
+    def _on_error(self, *args):
+        if self.process.error() == QtCore.QProcess.FailedToStart:
+            self.finished.emit(False, 'Failed to start {}'.format(self.process.program() if hasattr(self.process, 'program') else 'ffmpeg'))
+
+    def _on_finished(self, exit_code, exit_status=None):
+        success = not self.cancelled and exit_code == 0 and exit_status != QtCore.QProcess.CrashExit
+        error_text = '' if success or self.cancelled else '\n'.join(self._stderr_lines)
+        self.finished.emit(success, error_text)
+
+
+class FFmpegBatch(QtCore.QObject):
+    '''
+    runs steps of ffmpeg commands in the background, the commands of a step
+    all at once and the steps one after another, with the same signals as
+    FFmpegProcess. The progress adds up the frames of the running commands.
+    '''
+    progress = QtCore.Signal(dict)
+    finished = QtCore.Signal(bool, str)
+
+    def __init__(self, command_steps, total_frames=0, parent=None):
+        super(FFmpegBatch, self).__init__(parent)
+        self.command_steps = list(command_steps)
+        self.total_frames = total_frames
+        self.stats = {}
+        self.cancelled = False
+        self.step_index = -1
+        self.processes = []
+        self.step_stats = {}
+        self.done_frames = 0
+        self.remaining = 0
+        self.failed = False
+        self.error_text = ''
+
+    def start(self):
+        self._start_next_step()
+
+    def cancel(self):
+        self.cancelled = True
+        for ffmpeg_process in self.processes:
+            if ffmpeg_process.is_running():
+                ffmpeg_process.cancel()
+
+    def is_running(self):
+        return any(ffmpeg_process.is_running() for ffmpeg_process in self.processes)
+
+    def _start_next_step(self):
+        self.step_index += 1
+        if self.step_index >= len(self.command_steps):
+            return self.finished.emit(True, '')
+        self.processes = []
+        self.step_stats = {}
+        self.remaining = len(self.command_steps[self.step_index])
+        for index, command_to_run in enumerate(self.command_steps[self.step_index]):
+            ffmpeg_process = FFmpegProcess(command_to_run, 0, self)
+            ffmpeg_process.progress.connect(lambda stats, index=index: self._on_progress(index, stats))
+            ffmpeg_process.finished.connect(self._on_process_finished)
+            self.processes.append(ffmpeg_process)
+        for ffmpeg_process in self.processes:
+            ffmpeg_process.start()
+
+    def _on_progress(self, index, stats):
+        self.step_stats[index] = stats
+        all_stats = list(self.step_stats.values())
+        self.stats = {'frame': self.done_frames + sum(i.get('frame', 0) for i in all_stats),
+                      'fps': sum(i.get('fps', 0.0) for i in all_stats),
+                      'speed': sum(i.get('speed', 0.0) for i in all_stats),
+                      'out_time': all_stats[-1].get('out_time', '')}
+        if self.total_frames:
+            self.stats['percent'] = min(100, int(100 * self.stats['frame'] / float(self.total_frames)))
+        self.progress.emit(dict(self.stats))
+
+    def _on_process_finished(self, success, error_text):
+        self.remaining -= 1
+        if not success and not self.failed:
+            self.failed = True
+            self.error_text = '' if self.cancelled else error_text
+            for ffmpeg_process in self.processes:
+                if ffmpeg_process.is_running():
+                    ffmpeg_process.cancel()
+        if self.remaining > 0:
+            return
+        if self.failed or self.cancelled:
+            return self.finished.emit(False, self.error_text)
+        self.done_frames = self.stats.get('frame', self.done_frames)
+        self._start_next_step()
@@ -0,0 +1,215 @@
+'''
+playblast job queue of ANgular
+
+Every playblast taken from the dialog is a PlayblastJob of the queue. The
+queue captures the jobs one at a time on the main thread of maya whenever it
+is idle, and hands their captures to ffmpeg batches compiling, adding the
+audio and cleaning up in the background, so the capture of the next job runs
+while the previous one encodes.
+'''
+import os
+import time
+import functools
+
+try:
+    from PySide2 import QtCore
+except ImportError:
+    from PySide import QtCore
+
+import ANgularBrain as brain
+import ANgularPipeline as pipeline
+import ANgularProcess as process
+import ANgularTiming as timing
+
+
+class PlayblastJob(object):
+    '''
+    one playblast of the queue
+    Queued : waiting for maya to be idle to capture
+    Capturing : capturing the cameras on the main thread
+    Captured : waiting for a free compile
+    Compiling : compiling in the background
+    Done, Failed, Cancelled : over
+    '''
+    finished_statuses = ('Done', 'Failed', 'Cancelled',)
+
+    def __init__(self, settings, scene_name='', draft=False):
+        self.settings = settings
+        self.scene_name = scene_name
+        self.draft = draft
+        self.status = 'Queued'
+        self.error_text = ''
+        self.percent = 0
+        self.stats = {}
+        self.playblaster = None
+        self.all_playblasts = []
+        self.temporary_playblasts = []
+        self.ffmpeg_process = None
+        self.compile_started = False
+        self.cancelled = False
+
+    @property
+    def name(self):
+        return os.path.basename(self.settings.final_playblast_path)
+
+    def is_finished(self):
+        return self.status in self.finished_statuses
+
+    def get_label(self):
+        if self.status == 'Compiling':
+            return '{} : {} {}%'.format(self.name, self.status, self.percent)
+        return '{} : {}'.format(self.name, self.status)
+
+
+class PlayblastQueue(QtCore.QObject):
+    '''
+    captures the submitted jobs in order and compiles at most max_compiles of
+    them at once, emitting job_changed whenever a job changes status or
+    progress and job_finished once it is over
+    '''
+    job_changed = QtCore.Signal(object)
+    job_finished = QtCore.Signal(object)
+
+    def __init__(self, max_compiles=2, parent=None):
+        super(PlayblastQueue, self).__init__(parent)
+        self.max_compiles = max_compiles
+        self.jobs = []
+        self.capture_scheduled = False
+
+    def submit(self, settings, draft=False):
+        '''
+        queues a playblast of the validated settings, captured once maya is
+        idle. The jobs queued after a draft wait for it to be over, so it opens
+        before their capture holds maya.
+        '''
+        job = PlayblastJob(settings, brain.PlayblastFuncs.get_scene_name(), draft)
+        self.jobs.append(job)
+        self.job_changed.emit(job)
+        self.schedule_capture()
+        return job
+
+    def schedule_capture(self):
+        if any(job.draft and job.status in ('Capturing', 'Captured', 'Compiling') for job in self.jobs):
+            return
+        if not self.capture_scheduled and any(job.status == 'Queued' for job in self.jobs):
+            self.capture_scheduled = True
+            brain.PlayblastFuncs.run_when_idle(self.capture_next)
+
+    def capture_next(self):
+        '''
+        captures the first queued job, then starts its compile and waits for
+        maya to be idle again before capturing the next one
+        '''
+        self.capture_scheduled = False
+        job = next((job for job in self.jobs if job.status == 'Queued'), None)
+        if not job:
+            return
+        self.set_status(job, 'Capturing')
+        job.playblaster = pipeline.Playblaster(job.settings)
+        try:
+            if brain.PlayblastFuncs.get_scene_name() != job.scene_name:
+                raise pipeline.PlayblastError('Another scene was opened since the playblast was queued')
+            if job.settings.capture_mode == 'Streaming':
+                job.playblaster.stream_playblast(job.settings.final_playblast_path)
+                self.finish_job(job, True, '')
+            else:
+                job.all_playblasts, job.temporary_playblasts = job.playblaster.capture()
+                self.set_status(job, 'Captured')
+        except Exception as e:
+            self.finish_job(job, False, str(e))
+        finally:
+            self.schedule_capture()
+        self.start_compiles()
+
+    def start_compiles(self):
+        '''
+        starts compiling the captured jobs while fewer than max_compiles run
+        '''
+        for job in self.jobs:
+            if len([i for i in self.jobs if i.status == 'Compiling']) >= self.max_compiles:
+                return
+            if job.status == 'Captured':
+                self.start_compile(job)
+
+    def start_compile(self, job):
+        final_playblast_path = job.settings.final_playblast_path
+        try:
+            compile_commands = job.playblaster.get_compile_commands(final_playblast_path, job.all_playblasts)
+        except Exception as e:
+            return self.finish_job(job, False, str(e))
+        if not compile_commands:
+            return self.finish_job(job, True, '')
+
+        job.ffmpeg_process = process.FFmpegBatch(compile_commands, job.settings.frame_count, self)
+        job.ffmpeg_process.progress.connect(functools.partial(self.show_progress, job))
+        job.ffmpeg_process.finished.connect(functools.partial(self.finish_compile, job, time.time()))
+        self.set_status(job, 'Compiling')
+        job.compile_started = True
+        job.ffmpeg_process.start()
+
+    def show_progress(self, job, stats):
+        job.percent = stats.get('percent', 0)
+        job.stats = dict(stats)
+        self.job_changed.emit(job)
+
+    def finish_compile(self, job, start_time, success, error_text):
+        '''
+        records the background compile in the run log of the job and starts
+        the next captured job
+        '''
+        job.playblaster.run_log.add_stage('compile', time.time() - start_time,
+                                          frames=job.settings.frame_count,
+                                          bytes_read=sum(timing.get_size(i) for i in job.all_playblasts),
+                                          bytes_written=timing.get_size(job.settings.final_playblast_path),
+                                          speed=job.ffmpeg_process.stats.get('speed'))
+        job.ffmpeg_process = None
+        self.finish_job(job, success, error_text)
+        self.start_compiles()
+
+    def finish_job(self, job, success, error_text):
+        '''
+        cleans up the captures of the job and writes its run log, the partial
+        outputs of a failed compile being removed. Before the compile starts
+        the outputs on disk are the ones of an earlier playblast and are kept.
+        '''
+        if not success and job.compile_started:
+            for output_path in job.playblaster.get_output_paths():
+                if os.path.exists(output_path):
+                    job.playblaster.remove_file(output_path)
+        job.playblaster.cleanup(job.temporary_playblasts)
+        job.error_text = error_text
+        if success:
+            status = 'Done'
+        else:
+            status = 'Cancelled' if job.cancelled else 'Failed'
+        job.playblaster.write_run_log(status.lower(), error_text)
+        self.set_status(job, status)
+        self.job_finished.emit(job)
+        if job.draft:
+            self.schedule_capture()
+
+    def set_status(self, job, status):
+        job.status = status
+        self.job_changed.emit(job)
+
+    def cancel(self, job=None):
+        '''
+        cancels the given job, or every job not over yet
+        '''
+        for i in ([job] if job else list(self.jobs)):
+            if i.is_finished():
+                continue
+            i.cancelled = True
+            if i.ffmpeg_process and i.ffmpeg_process.is_running():
+                i.ffmpeg_process.cancel()
+            elif i.status == 'Queued':
+                self.set_status(i, 'Cancelled')
+                self.job_finished.emit(i)
+            elif i.status == 'Captured':
+                self.finish_job(i, False, '')
+
+    def clear_finished(self):
+        self.jobs = [job for job in self.jobs if not job.is_finished()]
+
+    def is_busy(self):
+        return any(not job.is_finished() for job in self.jobs)
@@ -0,0 +1,200 @@
+'''
+run log of ANgular
+
+A RunLog times every stage of a playblast, the camera captures, the ffmpeg
+passes and the cleanup, along with the frames, bytes read and written and the
+speed reported by ffmpeg, and writes them as one json record per run.
+A FrameProfile breaks the capture down frame by frame and camera by camera.
+'''
+import os
+import re
+import glob
+import json
+import time
+import contextlib
+
+_SPEED_PATTERN_ = re.compile(r'speed=\s*([0-9.]+)x')
+
+
+def get_size(path_pattern):
+    '''
+    gets the bytes of a file or of the frames of a %4d / %04d image sequence
+    '''
+    path_pattern = path_pattern.replace('%04d', '*').replace('%4d', '*')
+    return sum(os.path.getsize(path) for path in glob.glob(path_pattern) if os.path.isfile(path))
+
+
+def parse_ffmpeg_speed(stderr_text):
+    '''
+    gets the last encoding speed ffmpeg printed in its statistics, None if it
+    printed none
+    '''
+    speeds = _SPEED_PATTERN_.findall(stderr_text)
+    return float(speeds[-1]) if speeds else None
+
+
+class RunLog(object):
+    '''
+    timings of the stages of one playblast run
+    '''
+    def __init__(self, settings=None):
+        self.record = {'started': time.strftime('%Y-%m-%d %H:%M:%S'),
+                       'settings': settings or {},
+                       'stages': [],
+                       'status': 'running'}
+        self.start_time = time.time()
+
+    @contextlib.contextmanager
+    def stage(self, name, **measures):
+        '''
+        times the with block as a stage, the measures given or set on the
+        yielded stage dictionary (frames, bytes_read, bytes_written, speed)
+        are recorded with it
+        '''
+        stage = dict(name=name, **measures)
+        start_time = time.time()
+        try:
+            yield stage
+        finally:
+            stage['duration'] = round(time.time() - start_time, 3)
+            self.record['stages'].append(stage)
+
+    def add_stage(self, name, duration, **measures):
+        '''
+        records a stage timed elsewhere, like an ffmpeg process run in the
+        background
+        '''
+        stage = dict(name=name, duration=round(duration, 3), **measures)
+        self.record['stages'].append(stage)
+        return stage
+
+    def get_totals(self):
+        '''
+        gets the total duration of every stage name, in the order they first ran
+        '''
+        totals = []
+        for stage in self.record['stages']:
+            for total in totals:
+                if total['name'] == stage['name']:
+                    break
+            else:
+                total = {'name': stage['name'], 'duration': 0.0, 'count': 0}
+                totals.append(total)
+            total['duration'] += stage['duration']
+            total['count'] += 1
+        return totals
+
+    def finish(self, status='done', error=''):
+        self.record['status'] = status
+        self.record['duration'] = round(time.time() - self.start_time, 3)
+        if error:
+            self.record['error'] = error
+
+    def write(self, log_dir):
+        '''
+        writes the run as a json file of the log directory and gives back its path
+        '''
+        if not os.path.exists(log_dir):
+            os.makedirs(log_dir)
+        scene_name = self.record['settings'].get('scene_name', 'output')
+        log_path = os.path.join(log_dir, '{}_{}.json'.format(time.strftime('%Y%m%d_%H%M%S', time.localtime(self.start_time)), scene_name))
+        with open(log_path, 'w') as writer:
+            json.dump(self.record, writer, indent=4)
+        return log_path
+
+    def get_summary(self):
+        '''
+        gets a few readable lines of where the time went
+        '''
+        lines = []
+        for total in self.get_totals():
+            count = ' x{}'.format(total['count']) if total['count'] > 1 else ''
+            lines.append('{}{} : {:.2f}s'.format(total['name'], count, total['duration']))
+        for stage in self.record['stages']:
+            if stage.get('speed'):
+                lines.append('{} speed : {:.2f}x'.format(stage['name'], stage['speed']))
+        lines.append('total : {:.2f}s'.format(self.record.get('duration', time.time() - self.start_time)))
+        return '\n'.join(lines)
+
+
+class FrameProfile(object):
+    '''
+    scene evaluation and viewport readback times of every captured frame and
+    camera, the evaluation of a frame shared by all the cameras being recorded
+    without camera
+    '''
+    histogram_edges = (0.005, 0.01, 0.02, 0.04, 0.08, 0.16, 0.32, 0.64)
+
+    def __init__(self):
+        self.samples = []
+
+    def add(self, frame, camera=None, evaluation=0.0, readback=0.0):
+        self.samples.append({'frame': frame, 'camera': camera, 'evaluation': evaluation, 'readback': readback})
+
+    def get_frames(self):
+        '''
+        gets the times of every frame summed over the cameras, along with its
+        slowest camera, in frame order
+        '''
+        frames = {}
+        for sample in self.samples:
+            frame = frames.setdefault(sample['frame'], {'frame': sample['frame'], 'evaluation': 0.0, 'readback': 0.0, 'slowest_camera': None, 'camera_time': 0.0})
+            frame['evaluation'] += sample['evaluation']
+            frame['readback'] += sample['readback']
+            camera_time = sample['evaluation'] + sample['readback']
+            if sample['camera'] and camera_time > frame['camera_time']:
+                frame['slowest_camera'] = sample['camera']
+                frame['camera_time'] = camera_time
+        for frame in frames.values():
+            frame['total'] = frame['evaluation'] + frame['readback']
+            del frame['camera_time']
+        return [frames[key] for key in sorted(frames)]
+
+    def get_cameras(self):
+        '''
+        gets the times of every camera summed over the frames, the evaluations
+        shared by all the cameras left out
+        '''
+        cameras = {}
+        for sample in self.samples:
+            if not sample['camera']:
+                continue
+            camera = cameras.setdefault(sample['camera'], {'camera': sample['camera'], 'frames': 0, 'evaluation': 0.0, 'readback': 0.0})
+            camera['frames'] += 1
+            camera['evaluation'] += sample['evaluation']
+            camera['readback'] += sample['readback']
+        for camera in cameras.values():
+            camera['total'] = camera['evaluation'] + camera['readback']
+            camera['mean'] = camera['total'] / camera['frames']
+        return list(cameras.values())
+
+    def get_histogram(self, frames):
+        '''
+        gets how many frames took each doubling range of time
+        '''
+        edges = (0.0,) + self.histogram_edges + (None,)
+        histogram = [{'from': edges[index], 'to': edges[index + 1], 'count': 0} for index in range(len(edges) - 1)]
+        for frame in frames:
+            for bucket in histogram:
+                if bucket['to'] is None or frame['total'] < bucket['to']:
+                    bucket['count'] += 1
+                    break
+        return histogram
+
+    def get_report(self, top=10):
+        '''
+        gets the totals, the histogram of the frame times and the top slowest
+        frames and cameras
+        '''
+        frames = self.get_frames()
+        report = {'frames': len(frames),
+                  'evaluation': round(sum(frame['evaluation'] for frame in frames), 3),
+                  'readback': round(sum(frame['readback'] for frame in frames), 3),
+                  'histogram': self.get_histogram(frames),
+                  'slowest_frames': sorted(frames, key=lambda frame: frame['total'], reverse=True)[:top],
+                  'slowest_cameras': sorted(self.get_cameras(), key=lambda camera: camera['total'], reverse=True)[:top]}
+        for row in report['slowest_frames'] + report['slowest_cameras']:
+            for key in ('evaluation', 'readback', 'total', 'mean'):
+                if key in row:
+                    row[key] = round(row[key], 4)
+        return report
@@ -0,0 +1,149 @@
+'''
+headless capture workers for ANgular
+
+Run by mayapy, this module captures one camera of a scene snapshot over a
+frame range with the Viewport 2.0 batch renderer. Imported inside Maya, it
+launches those workers as a process pool.
+'''
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+import platform
+import subprocess
+
+_IMAGE_FORMATS_ = {'iff': 7, 'jpg': 8, 'bmp': 20, 'tga': 19, 'tiff': 3, 'tif': 3, 'png': 32}
+
+
+def get_mayapy_path():
+    '''
+    gets the mayapy executable running the workers, the ANGULAR_MAYAPY
+    environment variable overrides the one shipped with maya
+    '''
+    if os.environ.get('ANGULAR_MAYAPY'):
+        return os.environ['ANGULAR_MAYAPY']
+    executable = 'mayapy.exe' if platform.system() == 'Windows' else 'mayapy'
+    return os.path.join(os.environ.get('MAYA_LOCATION', ''), 'bin', executable)
+
+
+def split_frame_range(start_frame, end_frame, chunk_count):
+    '''
+    splits the frame range in at most chunk_count contiguous (start, end) chunks
+    '''
+    frame_count = end_frame - start_frame + 1
+    chunk_count = max(1, min(chunk_count, frame_count))
+    chunks = []
+    chunk_start = start_frame
+    for index in range(chunk_count):
+        chunk_size = frame_count // chunk_count + (1 if index < frame_count % chunk_count else 0)
+        chunks.append((chunk_start, chunk_start + chunk_size - 1))
+        chunk_start += chunk_size
+    return chunks
+
+
+def build_worker_command(executable, scene_path, camera, start_frame, end_frame, width, height, image_path_template, image_format):
+    '''
+    gets the command line capturing one camera over a frame range in a worker,
+    image_path_template is formatted with the frame number (e.g. shot_cam.%04d.jpg)
+    '''
+    worker_script = '{}.py'.format(os.path.splitext(os.path.abspath(__file__))[0])
+    return [executable, worker_script,
+            '--scene', scene_path,
+            '--camera', camera,
+            '--start', str(int(start_frame)),
+            '--end', str(int(end_frame)),
+            '--width', str(int(width)),
+            '--height', str(int(height)),
+            '--output', image_path_template,
+            '--image-format', image_format]
+
+
+def run_workers(worker_commands, max_workers, poll_interval=0.1, on_finished=None):
+    '''
+    runs the worker commands keeping at most max_workers of them alive at once
+    and gives back the return code of every command, in order. on_finished is
+    called with the index and return code of each command as soon as it ends.
+    '''
+    pending = list(enumerate(worker_commands))
+    running = {}
+    return_codes = [None] * len(worker_commands)
+    startupinfo = None
+    if platform.system() == 'Windows':
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    while pending or running:
+        while pending and len(running) < max(1, max_workers):
+            index, command = pending.pop(0)
+            try:
+                running[index] = subprocess.Popen(command, startupinfo=startupinfo)
+            except OSError:
+                return_codes[index] = -1
+                if on_finished:
+                    on_finished(index, -1)
+        for index, process in list(running.items()):
+            if process.poll() is not None:
+                return_codes[index] = process.returncode
+                del running[index]
+                if on_finished:
+                    on_finished(index, process.returncode)
+        if running:
+            time.sleep(poll_interval)
+    return return_codes
+
+
+def capture(scene_path, camera, start_frame, end_frame, width, height, image_path_template, image_format):
+    '''
+    opens the scene snapshot in maya standalone and renders every frame of the
+    camera with the Viewport 2.0 renderer
+    '''
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+    from maya import cmds
+
+    cmds.file(scene_path, open=True, force=True)
+    render_frames(camera, start_frame, end_frame, width, height, image_path_template, image_format)
+    maya.standalone.uninitialize()
+
+
+def render_frames(camera, start_frame, end_frame, width, height, image_path_template, image_format):
+    '''
+    renders every frame of the camera of the open scene with the Viewport 2.0
+    renderer, which unlike playblast works in maya standalone. The renders go
+    to a directory of their own next to the image sequence, as the workers of
+    the other cameras and chunks open the same snapshot and workspace.
+    '''
+    from maya import cmds
+
+    render_dir = tempfile.mkdtemp(prefix='render_', dir=os.path.dirname(os.path.abspath(image_path_template))).replace('\\', '/')
+    cmds.workspace(fileRule=['images', render_dir])
+    cmds.setAttr('defaultRenderGlobals.imageFilePrefix', '{}/render'.format(render_dir), type='string')
+    cmds.setAttr('defaultRenderGlobals.imageFormat', _IMAGE_FORMATS_.get(image_format, 32))
+    try:
+        for frame in range(int(start_frame), int(end_frame) + 1):
+            cmds.currentTime(frame)
+            rendered_path = cmds.ogsRender(camera=camera, width=width, height=height, currentFrame=True)
+            shutil.move(rendered_path, image_path_template % frame)
+    finally:
+        shutil.rmtree(render_dir, ignore_errors=True)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Captures a camera of a maya scene to an image sequence')
+    parser.add_argument('--scene', required=True)
+    parser.add_argument('--camera', required=True)
+    parser.add_argument('--start', type=int, required=True)
+    parser.add_argument('--end', type=int, required=True)
+    parser.add_argument('--width', type=int, required=True)
+    parser.add_argument('--height', type=int, required=True)
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--image-format', default='png')
+    options = parser.parse_args(args)
+    capture(options.scene, options.camera, options.start, options.end,
+            options.width, options.height, options.output, options.image_format)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())